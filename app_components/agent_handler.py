@@ -2,6 +2,7 @@ import time
 import uuid
 import re
 import logging
+import numpy as np
 import streamlit as st
 from typing import List, Tuple
 
@@ -9,14 +10,24 @@ from utils.config.loader import load_config
 from e2b_code_interpreter import Sandbox
 from langfuse.callback import CallbackHandler
 from graph.graph import graph_builder
+from graph.local_kernel import get_kernel
 from sklearn.model_selection import train_test_split
-from .data_handlers import save_file_to_disk
+from utils.dataset_store import register_dataset
+from utils.profiler import ProfilerCallbackHandler, profile_run
+from .data_handlers import save_split
+from .session_state import kernel_id
 
 
 logger = logging.getLogger(__name__)
 
 METRIC = "ROC-AUC"
 
+
+def _chunk_text(chunk) -> str:
+    if isinstance(chunk.content, str):
+        return chunk.content
+    return "".join(part.get("text", "") for part in chunk.content if isinstance(part, dict))
+
 def initialize_services():
     if "services_initialized" not in st.session_state:
         now = time.time()
@@ -71,6 +82,7 @@ def stream_agent_response_for_frontend():
 
     if "shown_human_messages" not in st.session_state:
         st.session_state.shown_human_messages = set()
+    st.session_state.node_ttft = []
 
     if (st.session_state.current_conversation not in st.session_state.conversations):
         st.error("Error: Current conversation not found.")
@@ -88,7 +100,8 @@ def stream_agent_response_for_frontend():
     test_df_name = st.session_state.get("test_df_name")
     if df_name and df_name in st.session_state.uploaded_files and not test_df_name:
         full_df = st.session_state.uploaded_files[df_name]["df"]
-        X_train, X_test = train_test_split(full_df, test_size=0.2, random_state=42)
+        # Same rows as splitting the frame itself; the rows are taken from the Arrow copy
+        train_indices, test_indices = train_test_split(np.arange(len(full_df)), test_size=0.2, random_state=42)
 
         if "." in df_name:
             base, ext = df_name.rsplit('.', 1)
@@ -98,6 +111,11 @@ def stream_agent_response_for_frontend():
             train_name = f"train"
             test_name = f"test"
 
+        # Save split datasets to disk
+        file_ext = st.session_state.uploaded_files[df_name]['type']
+        X_train = save_split(df_name, train_name, train_indices, file_ext, full_df)
+        X_test = save_split(df_name, test_name, test_indices, file_ext, full_df)
+
         st.session_state.uploaded_files[train_name] = {
             'df': X_train,
             'type': st.session_state.uploaded_files[df_name]['type'],
@@ -109,11 +127,6 @@ def stream_agent_response_for_frontend():
             'df_name': test_name
         }
 
-        # Save split datasets to disk
-        file_ext = st.session_state.uploaded_files[df_name]['type']
-        save_file_to_disk(X_train, train_name, file_ext)
-        save_file_to_disk(X_test, test_name, file_ext)
-
         st.session_state.df_name = train_name
         st.session_state.test_df_name = test_name
 
@@ -127,67 +140,108 @@ def stream_agent_response_for_frontend():
         df = st.session_state.uploaded_files[df_name]["df"]
 
     try:
-        agent_config = {"recursion_limit": rec_lim}
+        agent_config = {"recursion_limit": rec_lim, "callbacks": [ProfilerCallbackHandler()]}
 
         if langfuse_handler:
-            agent_config["callbacks"] = [langfuse_handler]
+            agent_config["callbacks"].append(langfuse_handler)
 
         agent_message = {"messages": conversation_history}
         agent_message["code_generation_config"] = config.general.code_generation_config
 
         if sandbox:
             agent_message["sandbox"] = sandbox
+        if config.general.code_generation_config == 'kernel':
+            agent_message["kernel"] = get_kernel(kernel_id(), config.general)
         if df is not None:
-            agent_message["df"] = df
+            agent_message["df"] = register_dataset(df_name, df)
             agent_message["df_name"] = df_name
         if test_df is not None:
-            agent_message["test_df"] = test_df
+            agent_message["test_df"] = register_dataset(test_df_name, test_df)
             agent_message["test_df_name"] = test_df_name
 
-        for values in agent.stream(agent_message, stream_mode="values", config=agent_config):
-            human_content = None
-            current_node = values.get("current_node")
-            matches = None
-
-
-            hu_list = values.get("human_understanding", [])
-            current_node = values.get("current_node")
-            st.session_state.current_node = current_node
-
-            if hu_list:
-                for hu_content in hu_list:
-                    if isinstance(hu_content, list):
-                        hu_content_str = "\n".join(str(item) for item in hu_content)
-                    else:
-                        hu_content_str = str(hu_content)
-
-                    if hu_content_str not in st.session_state.shown_human_messages:
-                        st.session_state.shown_human_messages.add(hu_content_str)
-                        human_content = hu_content_str
-                        break
-
-            if current_node == "result_summarization_agent" or current_node == "fedot_config_generator":
-                matches = re.findall(fr'{METRIC}: ([0-9]*\.[0-9]+)', values["messages"][-1].content)
-            elif current_node == "lightautoml_local_executor":
-                matches = re.findall(r'test data: ([0-9]*\.[0-9]+)', values["messages"][-1].content)
-            if matches is not None:
-                for match in matches:
-                        metric = float(match)
-                        st.session_state.extract_metric.append(metric)
-
-            message = values["messages"][-1]
-
-            if current_node is None:
-                continue
-
-            node_message_content = f"**{current_node}:** {message.content}"
-
-            yield {
-                "type": "assistant_message_chunk",
-                "node_name": current_node,
-                "content": node_message_content,
-                "human_content": human_content,
-            }
+        # A node starts when the previous one has published its state
+        node_started = time.perf_counter()
+        live_node = None
+        live_text = ""
+        live_ttft = None
+        history_tokens_saved = 0
+
+        with profile_run(run_id=st.session_state.current_conversation, export_dir=config.general.profile_dir) as run_profile:
+            for mode, payload in agent.stream(agent_message, stream_mode=["values", "messages"], config=agent_config):
+                if mode == "messages":
+                    chunk, metadata = payload
+                    node_name = metadata.get("langgraph_node")
+                    text = _chunk_text(chunk)
+                    if not node_name or not text:
+                        continue
+                    if node_name != live_node:
+                        live_node = node_name
+                        live_text = ""
+                        live_ttft = time.perf_counter() - node_started
+                        st.session_state.node_ttft.append((node_name, live_ttft))
+                        logger.info(f"Time to first token of {node_name}: {live_ttft:.2f}s")
+                    live_text += text
+                    yield {
+                        "type": "assistant_token_chunk",
+                        "node_name": node_name,
+                        "content": f"**{node_name}:** {live_text}",
+                        "ttft": live_ttft,
+                    }
+                    continue
+
+                values = payload
+                node_started = time.perf_counter()
+                history_tokens_saved = values.get("history_tokens_saved") or history_tokens_saved
+                human_content = None
+                current_node = values.get("current_node")
+                matches = None
+
+
+                hu_list = values.get("human_understanding", [])
+                current_node = values.get("current_node")
+                st.session_state.current_node = current_node
+
+                if hu_list:
+                    for hu_content in hu_list:
+                        if isinstance(hu_content, list):
+                            hu_content_str = "\n".join(str(item) for item in hu_content)
+                        else:
+                            hu_content_str = str(hu_content)
+
+                        if hu_content_str not in st.session_state.shown_human_messages:
+                            st.session_state.shown_human_messages.add(hu_content_str)
+                            human_content = hu_content_str
+                            break
+
+                if current_node == "result_summarization_agent" or current_node == "fedot_config_generator":
+                    matches = re.findall(fr'{METRIC}: ([0-9]*\.[0-9]+)', values["messages"][-1].content)
+                elif current_node == "lightautoml_local_executor":
+                    matches = re.findall(r'test data: ([0-9]*\.[0-9]+)', values["messages"][-1].content)
+                if matches is not None:
+                    for match in matches:
+                            metric = float(match)
+                            st.session_state.extract_metric.append(metric)
+
+                message = values["messages"][-1]
+
+                if current_node is None:
+                    continue
+
+                node_message_content = f"**{current_node}:** {message.content}"
+                ttft = live_ttft if live_node == current_node else None
+                live_node = None
+
+                yield {
+                    "type": "assistant_message_chunk",
+                    "node_name": current_node,
+                    "content": node_message_content,
+                    "human_content": human_content,
+                    "ttft": ttft,
+                }
+
+        st.session_state.run_profile = run_profile.to_dict()
+        st.session_state.history_tokens_saved = history_tokens_saved
+        logger.info(f"History compaction saved {history_tokens_saved} prompt tokens in this run")
 
     except RecursionError:
         logger.error(
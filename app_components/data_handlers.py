@@ -1,6 +1,13 @@
+import logging
 import pandas as pd
+import pyarrow as pa
 import streamlit as st
 from io import StringIO, BytesIO
+from typing import Sequence
+
+from utils.dataset_store import DATASETS_DIR, has_dataset, materialize, read_frame, take_rows
+
+logger = logging.getLogger(__name__)
 
 SUPPORTED_FILE_TYPES = {
     'csv': (pd.read_csv, lambda df, path: df.to_csv(path)),
@@ -36,3 +43,34 @@ def save_file_to_disk(df: pd.DataFrame, file_name: str, file_extension: str) ->
         writer_func(df, './datasets/'+file_name)
     except Exception as e:
         st.error(f"Error saving file to disk: {str(e)}")
+
+
+def share_dataset(df: pd.DataFrame, name: str) -> pd.DataFrame:
+    """Materialize the frame in the Arrow store and return the memory-mapped view of it."""
+    try:
+        materialize(df, name)
+        return read_frame(name)
+    except (pa.ArrowException, OSError) as e:
+        logger.warning(f"Could not store {name} as Arrow, keeping it in memory: {e}")
+        return df
+
+
+def save_upload(file_content: bytes, df: pd.DataFrame, file_name: str) -> pd.DataFrame:
+    """Keep the upload on disk as it was sent and share its decoded frame through the Arrow store."""
+    try:
+        DATASETS_DIR.mkdir(exist_ok=True)
+        (DATASETS_DIR / file_name).write_bytes(file_content)
+    except OSError as e:
+        st.error(f"Error saving file to disk: {str(e)}")
+    return share_dataset(df, file_name)
+
+
+def save_split(source_name: str, target_name: str, indices: Sequence[int], file_extension: str,
+               source_df: pd.DataFrame) -> pd.DataFrame:
+    """Store rows of an uploaded dataset as a new dataset, taking them from the Arrow copy when there is one."""
+    # Generated code reads the split by its file name; written first so the Arrow copy is stamped with it
+    save_file_to_disk(source_df.iloc[indices], target_name, file_extension)
+    if has_dataset(source_name):
+        take_rows(source_name, target_name, indices)
+        return read_frame(target_name)
+    return share_dataset(source_df.iloc[indices], target_name)
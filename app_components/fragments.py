@@ -1,20 +1,28 @@
+import time
+from pathlib import Path
 import streamlit as st
 import pandas as pd
 from typing import Dict, Any, List, Optional
 
 from .agent_handler import stream_agent_response_for_frontend
-from .data_handlers import load_data, save_file_to_disk
-from .session_state import create_new_conversation
+from .data_handlers import load_data, save_upload
+from .session_state import create_new_conversation, leave_conversation
 from .data_handlers import SUPPORTED_FILE_TYPES
 
 COLUMN_SHAPES = [1, 1]
 BENCHMARK_CSV_PATH = "benchmark/benchmark_results.csv"
-ID = "employee_promotion"
+HUMAN_EXPLANATION_NODES = ["human_explanation_planning", "human_explanation_validator", "human_explanation_improvement", "human_explanation_results"]
+# Minimal pause between redraws while tokens are streaming
+STREAM_RENDER_INTERVAL = 0.15
+
+def benchmark_id(df_name: Optional[str]) -> Optional[str]:
+    """Benchmark suite id of an uploaded dataset: its file name without the extension."""
+    return Path(df_name).stem if df_name else None
 
 def get_benchmarks_from_csv(benchmark_csv_path, id):
     df = pd.read_csv(benchmark_csv_path)
-    row = df[df['id'] == id].iloc[0]
-    return row
+    rows = df[df['id'] == id]
+    return rows.iloc[0] if not rows.empty else None
 
 def update_ds_agent_history(benchmark_csv_path, id, ds_agent_result):
     df = pd.read_csv(benchmark_csv_path)
@@ -100,22 +108,30 @@ def file_upload_fragment():
             status_placeholder = st.empty()
             status_placeholder.info(st.session_state.loading_message)
 
-            df = load_data(file_content, file_type)
-            st.write(df.head())
-
-            if sandbox is not None:
-                sandbox.files.write(file_name, file_content)
-                save_file_to_disk(df, file_name, file_type)
+            upload_id = getattr(train_file, "file_id", None)
+            uploaded = st.session_state.uploaded_files.get(file_name)
+            if uploaded is not None and upload_id is not None and uploaded.get('upload_id') == upload_id:
+                # Fragment rerun with the same upload, it is already stored
+                df = uploaded['df']
+                st.write(df.head())
             else:
-                save_file_to_disk(df, file_name, file_type)
+                df = load_data(file_content, file_type)
+                st.write(df.head())
+
+                if sandbox is not None:
+                    sandbox.files.write(file_name, file_content)
+                df = save_upload(file_content, df, file_name)
 
             st.session_state.uploaded_files[file_name] = {
                 'df': df,
                 'type': file_type,
-                'df_name': file_name
+                'df_name': file_name,
+                'upload_id': upload_id
             }
 
             st.session_state.df_name = file_name
+            # df_name becomes "train.<ext>" once a single upload is split; the benchmark id stays with the upload
+            st.session_state.uploaded_name = file_name
 
             st.session_state.loading_message = ""
             status_placeholder.empty()
@@ -141,19 +157,25 @@ def file_upload_fragment():
             status_placeholder = st.empty()
             status_placeholder.info(st.session_state.loading_message)
 
-            df = load_data(file_content, file_type)
-            st.write(df.head())
-
-            if sandbox is not None:
-                sandbox.files.write(file_name, file_content)
-                save_file_to_disk(df, file_name, file_type)
+            upload_id = getattr(test_file, "file_id", None)
+            uploaded = st.session_state.uploaded_test_files.get(file_name)
+            if uploaded is not None and upload_id is not None and uploaded.get('upload_id') == upload_id:
+                # Fragment rerun with the same upload, it is already stored
+                df = uploaded['df']
+                st.write(df.head())
             else:
-                save_file_to_disk(df, file_name, file_type)
+                df = load_data(file_content, file_type)
+                st.write(df.head())
+
+                if sandbox is not None:
+                    sandbox.files.write(file_name, file_content)
+                df = save_upload(file_content, df, file_name)
 
             st.session_state.uploaded_test_files[file_name] = {
                 'df': df,
                 'type': file_type,
-                'df_name': file_name
+                'df_name': file_name,
+                'upload_id': upload_id
             }
 
             st.session_state.test_df_name = file_name
@@ -172,6 +194,8 @@ def file_upload_fragment():
 
 
 def switch_conversation(conv_id):
+    if conv_id != st.session_state.current_conversation:
+        leave_conversation()
     st.session_state.current_conversation = conv_id
     st.session_state.user_input_key += 1
     st.session_state.accumulated_status_messages = []
@@ -219,14 +243,36 @@ def process_agent_events(status_placeholder, pipeline_placeholder):
     temp_assistant_messages = []
 
     agent_event_iterator = stream_agent_response_for_frontend()
+    last_render = 0.0
 
     for event in agent_event_iterator:
-        if event["type"] == "assistant_message_chunk":
+        if event["type"] == "assistant_token_chunk":
+            if time.perf_counter() - last_render < STREAM_RENDER_INTERVAL:
+                continue
+            status_messages = st.session_state.accumulated_status_messages
+            interpretation_messages = accumulated_interpretation_messages
+            if event["node_name"] in HUMAN_EXPLANATION_NODES:
+                interpretation_messages = interpretation_messages + [event["content"]]
+            else:
+                status_messages = status_messages + [event["content"]]
+            render_status_boxes(
+                status_messages,
+                interpretation_messages,
+                "Processing request...",
+                "Code interpretation...",
+                "running",
+                True,
+                status_placeholder,
+                pipeline_placeholder
+            )
+            last_render = time.perf_counter()
+
+        elif event["type"] == "assistant_message_chunk":
             content = event["content"]
             human_content = event.get("human_content", None)
             node_name = event.get("node_name", "")
 
-            if node_name not in ["human_explanation_planning", "human_explanation_validator", "human_explanation_improvement", "human_explanation_results"]:
+            if node_name not in HUMAN_EXPLANATION_NODES:
                 st.session_state.accumulated_status_messages.append(content)
 
             if human_content:
@@ -242,6 +288,7 @@ def process_agent_events(status_placeholder, pipeline_placeholder):
                 status_placeholder,
                 pipeline_placeholder
             )
+            last_render = time.perf_counter()
 
             temp_assistant_messages.append({
                 "role": "assistant",
@@ -267,22 +314,25 @@ def finalize_conversation(temp_assistant_messages, accumulated_interpretation_me
         st.session_state.conversations[current_conv_id].append(consolidated_message)
 
 def get_table_results():
-    row = get_benchmarks_from_csv(BENCHMARK_CSV_PATH, ID)
-    
+    dataset_id = benchmark_id(st.session_state.get("uploaded_name"))
+    row = get_benchmarks_from_csv(BENCHMARK_CSV_PATH, dataset_id) if dataset_id else None
+
+    if row is None or st.session_state.current_node == "no_code_agent":
+        st.session_state.benchmark_history.append(None)
+        return
+
     if st.session_state.get("extract_metric", []):
         ds_agent_result = max(st.session_state.extract_metric)
     else:
         ds_agent_result = row['our_data']
 
     data = {
-        'Logistic Regression': row['LogisticRegression'],
-        'LGBM': row['LGBM'],
-        'Tabular NN': row['Tabular NN'],
+        'id': dataset_id,
+        'Logistic Regression': row.get('LogisticRegression'),
+        'LGBM': row.get('LGBM'),
+        'Tabular NN': row.get('Tabular NN'),
         'LADS': ds_agent_result,
     }
-
-    if st.session_state.current_node == "no_code_agent":
-        data = None
         
     st.session_state.benchmark_history.append(data)
 
@@ -355,9 +405,10 @@ def render_conversation(user_message: str, assistant_message: Dict[str, Any], ta
     with st.container():
         if st.session_state.benchmark_history and table_raw is not None:
             st.markdown("#### Benchmark")
-            df = pd.DataFrame([table_raw])
+            df = pd.DataFrame([table_raw]).set_index('id')
             if st.session_state.benchmark_history[-1] is not None:
-                update_ds_agent_history(BENCHMARK_CSV_PATH, ID, st.session_state.benchmark_history[-1]['LADS'])
+                last = st.session_state.benchmark_history[-1]
+                update_ds_agent_history(BENCHMARK_CSV_PATH, last['id'], last['LADS'])
             st.dataframe(df.style.highlight_max(axis=1, color="#39FF14"), use_container_width=True)
         st.markdown("---")
 
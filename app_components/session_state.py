@@ -2,6 +2,8 @@ import datetime
 import streamlit as st
 import uuid
 
+from graph.local_kernel import shutdown_kernel
+
 
 def initialize_session_state() -> None:
 
@@ -16,6 +18,7 @@ def initialize_session_state() -> None:
         "figures": {},
         "current_human_text": [],
         "df_name": None,
+        "uploaded_name": None,
         "test_df_name": None,
         "transcribed_text": "",
         "loading_message": "",
@@ -31,8 +34,20 @@ def initialize_session_state() -> None:
         st.session_state.setdefault(key, default_value)
 
 
+def kernel_id() -> str:
+    # Conversation ids are timestamps and repeat across browser sessions; the session uuid does not
+    return f"{st.session_state.uuid}:{st.session_state.current_conversation}"
+
+
+def leave_conversation() -> None:
+    # The kernel of a conversation holds a process per checkpoint; it restarts on the next run there
+    if st.session_state.current_conversation is not None:
+        shutdown_kernel(kernel_id())
+
+
 def create_new_conversation() -> str:
 
+    leave_conversation()
     conversation_id = datetime.datetime.now().strftime("%Y%m%d_%H%M%S")
     st.session_state.conversations[conversation_id] = []
     st.session_state.current_conversation = conversation_id
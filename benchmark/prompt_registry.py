@@ -0,0 +1,41 @@
+"""Compare building prompt templates on every call with the precompiled registry.
+
+Run from the repository root:
+    python -m benchmark.prompt_registry --repeat 200
+"""
+import argparse
+import timeit
+
+from graph.prompts import PROMPT_SETS, build_prompt, load_prompt, warm_up_prompts
+from utils.config.loader import load_config
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Benchmark prompt template construction')
+    parser.add_argument('--repeat', type=int, default=200, help='Number of passes over all prompts')
+    args = parser.parse_args()
+
+    language = load_config().general.prompt_language
+    prompt_names = list(PROMPT_SETS[(language, 'gigachat')])
+    calls = args.repeat * len(prompt_names)
+
+    def current_path():
+        for name in prompt_names:
+            build_prompt(name, language)
+
+    def registry_path():
+        for name in prompt_names:
+            load_prompt(name)
+
+    warm_up_time = timeit.timeit(warm_up_prompts, number=1)
+    build_time = timeit.timeit(current_path, number=args.repeat)
+    registry_time = timeit.timeit(registry_path, number=args.repeat)
+
+    print(f"Warm-up of all prompts: {warm_up_time * 1000:.2f} ms")
+    print(f"Build on every call:    {build_time / calls * 1e6:.1f} us/prompt")
+    print(f"Registry lookup:        {registry_time / calls * 1e6:.1f} us/prompt")
+    print(f"Speedup: x{build_time / registry_time:.1f}")
+
+
+if __name__ == '__main__':
+    main()
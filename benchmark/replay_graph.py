@@ -0,0 +1,89 @@
+"""Run the agent graph on a recorded session, without network access.
+
+Record a cassette once with live providers:
+    python -m benchmark.replay_graph --record --cassette .cache/cassettes/titanic.jsonl \
+        --dataset datasets/titanic.csv --task "Predict Survived"
+
+then replay it as often as needed (e.g. in CI) to time our own code:
+    python -m benchmark.replay_graph --cassette .cache/cassettes/titanic.jsonl \
+        --dataset datasets/titanic.csv --task "Predict Survived" --repeat 5
+"""
+import argparse
+import statistics
+import time
+from pathlib import Path
+
+import pandas as pd
+from langchain_core.messages import HumanMessage
+
+from graph.graph import graph_builder
+from utils.config.loader import load_config
+from utils.dataset_store import DATASETS_DIR, register_dataset
+from utils.llm_replay import get_cassette, use_cassette
+from utils.profiler import ProfilerCallbackHandler, profile_run
+
+
+def dataset_name(path: Path) -> str:
+    """Name of a dataset file as the app passes it: relative to datasets/, with its extension."""
+    try:
+        return path.resolve().relative_to(DATASETS_DIR.resolve()).as_posix()
+    except ValueError:
+        return path.name
+
+
+def run_once(agent, task: str, dataset: Path | None, test_dataset: Path | None, recursion_limit: int):
+    config = load_config()
+    cassette = get_cassette(config.replay)
+    if cassette is not None and cassette.replaying:
+        # Every repeat replays the same conversation from its first answer
+        cassette.rewind()
+    message = {
+        "messages": [HumanMessage(content=task)],
+        "code_generation_config": config.general.code_generation_config,
+    }
+    for key, path in (("df", dataset), ("test_df", test_dataset)):
+        if path is not None:
+            name = dataset_name(path)
+            message[key] = register_dataset(name, pd.read_csv(path) if path.suffix == '.csv' else pd.read_parquet(path))
+            message[f"{key}_name"] = name
+
+    with profile_run() as run_profile:
+        state = agent.invoke(message, config={"recursion_limit": recursion_limit,
+                                              "callbacks": [ProfilerCallbackHandler()]})
+    return state, run_profile
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Replay a recorded agent session and time it')
+    parser.add_argument('--cassette', required=True, help='JSON lines file with the recorded LLM calls')
+    parser.add_argument('--task', required=True, help='User request sent to the agent')
+    parser.add_argument('--dataset', type=Path, help='Train dataset (csv or parquet)')
+    parser.add_argument('--test-dataset', type=Path, help='Test dataset (csv or parquet)')
+    parser.add_argument('--record', action='store_true', help='Call the providers and write the cassette')
+    parser.add_argument('--repeat', type=int, default=3, help='Number of replays')
+    parser.add_argument('--latency', type=float, default=0.0, help='Seconds added to each replayed LLM call')
+    parser.add_argument('--recursion-limit', type=int, default=50)
+    args = parser.parse_args()
+
+    use_cassette(args.cassette, 'record' if args.record else 'replay', args.latency)
+    repeat = 1 if args.record else args.repeat
+
+    started = time.perf_counter()
+    agent = graph_builder()
+    build_time = time.perf_counter() - started
+
+    timings = []
+    for _ in range(repeat):
+        started = time.perf_counter()
+        state, run_profile = run_once(agent, args.task, args.dataset, args.test_dataset, args.recursion_limit)
+        timings.append(time.perf_counter() - started)
+
+    print(f"Graph build: {build_time * 1000:.1f} ms")
+    print(f"Runs:        {', '.join(f'{t:.2f}s' for t in timings)}")
+    print(f"Median run:  {statistics.median(timings):.2f}s")
+    print(run_profile.flame_summary())
+    print(f"Answer:\n{state['messages'][-1].content}")
+
+
+if __name__ == '__main__':
+    main()
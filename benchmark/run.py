@@ -0,0 +1,245 @@
+"""End-to-end benchmark of the agent graph and FedotAI over a suite of local datasets.
+
+Run from the repository root:
+    python -m benchmark.run                      # every dataset of benchmark/suite.yml, both runners
+    python -m benchmark.run --datasets titanic --runners graph --cassette-dir .cache/cassettes
+
+Every case runs in a fresh process, so peak memory and caches are measured per case.
+Each result (metric, wall time per stage, LLM calls and tokens, peak RSS) is appended
+to benchmark/results.jsonl with the commit it was measured on, compared with the
+previous result of the same case, and the latest metric is copied to
+benchmark_results.csv, which the app shows next to the classic baselines.
+"""
+import argparse
+import json
+import re
+import resource
+import subprocess
+import sys
+import time
+import traceback
+import uuid
+from concurrent.futures import ProcessPoolExecutor
+from multiprocessing import get_context
+from pathlib import Path
+from typing import Any, Dict, List, Optional
+
+import pandas as pd
+import yaml
+
+from graph.worker_pool import RSS_UNIT
+
+SUITE_PATH = Path('benchmark/suite.yml')
+RESULTS_PATH = Path('benchmark/results.jsonl')
+SUMMARY_CSV_PATH = Path('benchmark/benchmark_results.csv')
+RUNNERS = ('graph', 'fedot')
+METRIC_REGEX = r"['\"]?([A-Za-z][\w\- ]*?)['\"]?\s*[:=]\s*(-?[0-9]*\.?[0-9]+(?:[eE][-+]?[0-9]+)?)"
+
+
+def _normalize(name: str) -> str:
+    return re.sub(r'[^a-z0-9]', '', name.lower())
+
+
+def extract_metric(text: str, metric: str) -> Optional[float]:
+    """Last value reported for `metric` in the text ('ROC-AUC: 0.8', "{'roc_auc': 0.8}", ...)."""
+    values = [float(value) for name, value in re.findall(METRIC_REGEX, text or '')
+              if _normalize(name).endswith(_normalize(metric))]
+    return values[-1] if values else None
+
+
+def _version() -> str:
+    try:
+        return subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], capture_output=True, text=True,
+                              check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return 'unknown'
+
+
+def _read_frame(path: Path) -> pd.DataFrame:
+    return pd.read_parquet(path) if path.suffix == '.parquet' else pd.read_csv(path)
+
+
+def _run_graph(case: Dict[str, Any]) -> str:
+    from langchain_core.messages import HumanMessage
+    from graph.graph import graph_builder
+    from utils.config.loader import load_config
+    from utils.dataset_store import DATASETS_DIR, register_dataset
+    from utils.profiler import ProfilerCallbackHandler
+
+    message = {
+        'messages': [HumanMessage(content=case['task'])],
+        'code_generation_config': load_config().general.code_generation_config,
+    }
+    for key in ('train', 'test'):
+        if case.get(key):
+            path = Path(case[key])
+            state_key = 'df' if key == 'train' else 'test_df'
+            # Relative to datasets/, like uploads, so the name identifies the case and opens from generated code
+            name = path.resolve().relative_to(DATASETS_DIR.resolve()).as_posix()
+            message[state_key] = register_dataset(name, _read_frame(path))
+            message[f"{state_key}_name"] = name
+
+    state = graph_builder().invoke(message, config={'recursion_limit': case.get('recursion_limit', 50),
+                                                    'callbacks': [ProfilerCallbackHandler()]})
+    return '\n'.join(str(m.content) for m in state['messages'])
+
+
+def _run_fedot(case: Dict[str, Any]) -> str:
+    from fedotllm.main import FedotAI
+
+    workspace = Path('.cache/benchmark') / f"{case['id']}_{uuid.uuid4().hex[:8]}"
+    response = FedotAI(task_path=Path(case['train']).parent, workspace=workspace).invoke(case['task'])
+    messages = (response or {}).get('messages', [])
+    return '\n'.join([str((response or {}).get('metrics', ''))] + [str(m.content) for m in messages])
+
+
+def run_case(case: Dict[str, Any], runner: str, cassette: Optional[str] = None) -> Dict[str, Any]:
+    """Run one case in the current (fresh) process."""
+    from utils.llm_replay import use_cassette
+    from utils.profiler import profile_run
+
+    if cassette:
+        use_cassette(cassette, 'replay' if Path(cassette).exists() else 'record')
+
+    result = {'dataset': case['id'], 'runner': runner, 'status': 'ok', 'error': None, 'metric': None}
+    started = time.perf_counter()
+    with profile_run(run_id=f"{case['id']}-{runner}") as run_profile:
+        try:
+            output = (_run_graph if runner == 'graph' else _run_fedot)(case)
+            result['metric'] = extract_metric(output, case['metric'])
+            if result['metric'] is None:
+                result['status'] = 'no_metric'
+        except Exception as e:
+            result['status'] = 'error'
+            result['error'] = ''.join(traceback.format_exception_only(type(e), e)).strip()
+
+    stages: Dict[str, float] = {}
+    for span in run_profile.spans:
+        if span.parent is None:
+            stages[span.name] = stages.get(span.name, 0.0) + span.wall
+    totals = run_profile.totals()
+    own = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss * RSS_UNIT
+    children = resource.getrusage(resource.RUSAGE_CHILDREN).ru_maxrss * RSS_UNIT
+    result.update(
+        wall=time.perf_counter() - started,
+        stages={name: round(wall, 3) for name, wall in stages.items()},
+        llm_calls=totals['llm_calls'],
+        prompt_tokens=totals['prompt_tokens'],
+        completion_tokens=totals['completion_tokens'],
+        tokens=totals['prompt_tokens'] + totals['completion_tokens'],
+        retries=totals['retries'],
+        # RUSAGE_CHILDREN only covers direct children; pool workers report their snippets' peaks in the spans
+        peak_rss=max(own, children, totals['max_rss']),
+    )
+    return result
+
+
+def load_results(path: Path = RESULTS_PATH) -> List[Dict[str, Any]]:
+    if not path.exists():
+        return []
+    with path.open(encoding='utf-8') as f:
+        return [json.loads(line) for line in f if line.strip()]
+
+
+def find_baseline(results: List[Dict[str, Any]], dataset: str, runner: str,
+                  version: Optional[str] = None, replayed: bool = False) -> Optional[Dict[str, Any]]:
+    """Latest successful result of the case, optionally from a given commit.
+
+    Replayed and live runs are only compared among themselves: replay skips the model latency.
+    """
+    for result in reversed(results):
+        if (result['dataset'] == dataset and result['runner'] == runner and result['status'] == 'ok'
+                and result.get('replayed', False) == replayed
+                and (version is None or result['version'] == version)):
+            return result
+    return None
+
+
+def regressions(result: Dict[str, Any], baseline: Optional[Dict[str, Any]], case: Dict[str, Any],
+                tolerance: Dict[str, float]) -> List[str]:
+    if baseline is None:
+        return []
+    if result['status'] != 'ok':
+        return [f"status {result['status']} (was ok)"]
+
+    flags = []
+    sign = 1 if case.get('greater_is_better', True) else -1
+    if (baseline['metric'] - result['metric']) * sign > tolerance['metric']:
+        flags.append(f"{case['metric']} {baseline['metric']:.4f} -> {result['metric']:.4f}")
+    for key, name in (('wall', 'wall'), ('tokens', 'tokens'), ('peak_rss', 'memory')):
+        if baseline[key] and result[key] > baseline[key] * (1 + tolerance[name]):
+            flags.append(f"{key} {baseline[key]:.6g} -> {result[key]:.6g}")
+    return flags
+
+
+def update_summary(dataset: str, metric: float, path: Path = SUMMARY_CSV_PATH):
+    """Put the latest LADS metric of the dataset into the table shown by the app."""
+    df = pd.read_csv(path) if path.exists() else pd.DataFrame(columns=['id', 'our_data'])
+    if dataset in set(df['id']):
+        df.loc[df['id'] == dataset, 'our_data'] = metric
+    else:
+        df = pd.concat([df, pd.DataFrame([{'id': dataset, 'our_data': metric}])], ignore_index=True)
+    df.to_csv(path, index=False)
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Run the end-to-end benchmark suite')
+    parser.add_argument('--suite', type=Path, default=SUITE_PATH)
+    parser.add_argument('--results', type=Path, default=RESULTS_PATH)
+    parser.add_argument('--datasets', nargs='*', help='Dataset ids to run (all by default)')
+    parser.add_argument('--runners', nargs='*', choices=RUNNERS, default=list(RUNNERS))
+    parser.add_argument('--baseline', help='Compare with the results of this commit instead of the previous run')
+    parser.add_argument('--cassette-dir', type=Path,
+                        help='Replay LLM calls from <dir>/<dataset>-<runner>.jsonl, recording missing cassettes')
+    parser.add_argument('--fail-on-regression', action='store_true')
+    args = parser.parse_args()
+
+    suite = yaml.safe_load(args.suite.read_text(encoding='utf-8'))
+    tolerance = suite.get('tolerance', {})
+    tolerance = {key: tolerance.get(key, 0.25) for key in ('wall', 'tokens', 'memory')} | {
+        'metric': tolerance.get('metric', 0.01)}
+    cases = [case for case in suite['datasets'] if not args.datasets or case['id'] in args.datasets]
+
+    history = load_results(args.results)
+    run_id = uuid.uuid4().hex[:12]
+    version = _version()
+    flagged = False
+
+    for case in cases:
+        missing = [case[key] for key in ('train', 'test') if case.get(key) and not Path(case[key]).exists()]
+        if missing:
+            print(f"{case['id']}: skipped, missing {', '.join(missing)}")
+            continue
+        for runner in args.runners:
+            cassette = str(args.cassette_dir / f"{case['id']}-{runner}.jsonl") if args.cassette_dir else None
+            with ProcessPoolExecutor(max_workers=1, mp_context=get_context('spawn')) as executor:
+                result = executor.submit(run_case, case, runner, cassette).result()
+            result.update(run_id=run_id, version=version, suite_version=suite.get('version'),
+                          timestamp=time.time(), replayed=bool(cassette))
+
+            baseline = find_baseline(history, case['id'], runner, args.baseline, replayed=result['replayed'])
+            result['baseline_version'] = baseline['version'] if baseline else None
+            result['regressions'] = regressions(result, baseline, case, tolerance)
+            flagged = flagged or bool(result['regressions'])
+
+            args.results.parent.mkdir(parents=True, exist_ok=True)
+            with args.results.open('a', encoding='utf-8') as f:
+                f.write(json.dumps(result) + '\n')
+            history.append(result)
+            if result['status'] == 'ok' and runner == 'graph':
+                update_summary(case['id'], result['metric'])
+
+            metric = f"{result['metric']:.4f}" if result['metric'] is not None else result['status']
+            print(f"{case['id']:<24} {runner:<6} {case['metric']} {metric:<10} {result['wall']:8.1f}s "
+                  f"{result['llm_calls']:4d} calls {result['tokens']:8d} tok {result['peak_rss'] / 2 ** 20:7.0f}MB")
+            if result['error']:
+                print(f"    {result['error']}")
+            for flag in result['regressions']:
+                print(f"    REGRESSION vs {result['baseline_version']}: {flag}")
+
+    if flagged and args.fail_on_regression:
+        sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,59 @@
+import threading
+from pathlib import Path
+from typing import Any, Optional
+
+from fedot.api.main import Fedot
+from golem.core.dag.graph_utils import graph_structure
+from pydantic import BaseModel, ConfigDict
+
+from fedotllm.log import logger
+from utils.fingerprint import directory_fingerprint
+
+
+class LoadedPipeline(BaseModel):
+    model_config = ConfigDict(arbitrary_types_allowed=True, frozen=True)
+
+    fingerprint: str
+    pipeline: Any = None
+    structure: Optional[str] = None
+    error: Optional[str] = None
+
+
+class PipelineCache:
+    """The trained pipeline of a workspace, loaded once per version of its files.
+
+    One instance is shared by the nodes of an `AutoMLAgent` graph: `run_tests` and
+    `extract_metrics` of the same iteration get the same loaded pipeline, and it is
+    loaded again only after the generated code has written a new one.
+    """
+
+    def __init__(self, workspace: Path):
+        self.path = Path(workspace) / "pipeline"
+        self._lock = threading.Lock()
+        self._loaded: Optional[LoadedPipeline] = None
+
+    def exists(self) -> bool:
+        return self.path.exists()
+
+    def get(self) -> LoadedPipeline:
+        if not self.path.exists():
+            raise FileNotFoundError(f"Pipeline not found at {self.path}")
+        fingerprint = directory_fingerprint(self.path)
+        with self._lock:
+            if self._loaded is None or self._loaded.fingerprint != fingerprint:
+                self._loaded = self._load(fingerprint)
+            return self._loaded
+
+    def _load(self, fingerprint: str) -> LoadedPipeline:
+        logger.info(f"Loading pipeline from {self.path}")
+        try:
+            model = Fedot(problem="classification")
+            model.load(self.path)
+            return LoadedPipeline(
+                fingerprint=fingerprint,
+                pipeline=model.current_pipeline,
+                structure=graph_structure(model.current_pipeline),
+            )
+        except Exception as e:
+            # The same files would fail the same way, so the error is cached too
+            return LoadedPipeline(fingerprint=fingerprint, error=str(e))
@@ -4,6 +4,7 @@ from pathlib import Path
 from langgraph.graph import END, START, StateGraph
 from langgraph.types import Command
 
+from fedotllm.agents.automl.artifacts import PipelineCache
 from fedotllm.agents.automl.nodes import (
     evaluate,
     extract_metrics,
@@ -28,6 +29,7 @@ class AutoMLAgent:
         self.inference = inference
         self.dataset = dataset
         self.workspace = workspace
+        self.pipelines = PipelineCache(workspace)
 
     def init_state(self, state: AutoMLAgentState):
         return Command(
@@ -76,10 +78,10 @@ class AutoMLAgent:
         )
         workflow.add_node(
             "run_tests",
-            partial(run_tests, workspace=self.workspace, inference=self.inference),
+            partial(run_tests, workspace=self.workspace, inference=self.inference, pipelines=self.pipelines),
         )
         workflow.add_node(
-            "extract_metrics", partial(extract_metrics, workspace=self.workspace)
+            "extract_metrics", partial(extract_metrics, workspace=self.workspace, pipelines=self.pipelines)
         )
         workflow.add_node(
             "generate_report", partial(generate_report, inference=self.inference)
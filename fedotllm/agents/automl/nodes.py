@@ -1,14 +1,16 @@
+import asyncio
 import re
+import time
 from pathlib import Path
 
 import pandas as pd
-from fedot.api.main import Fedot
-from golem.core.dag.graph_utils import graph_structure
 from langchain_core.messages import HumanMessage, convert_to_openai_messages
-from langgraph.types import Command
+from langgraph.types import Command, StreamWriter
 
 from fedotllm import prompts
+from fedotllm.agents.automl.artifacts import PipelineCache
 from fedotllm.agents.automl.state import AutoMLAgentState
+from fedotllm.agents.automl.submission import compare_schemas, read_schema
 from fedotllm.agents.automl.structured import FedotConfig
 from fedotllm.agents.automl.templates.load_template import (
     load_template,
@@ -22,6 +24,7 @@ from fedotllm.enviroments import (
 )
 from fedotllm.llm import AIInference
 from fedotllm.log import logger
+from utils import profiler
 from utils.config.loader import load_config
 
 PREDICT_METHOD_MAP = {
@@ -31,7 +34,7 @@ PREDICT_METHOD_MAP = {
 }
 
 
-def problem_reflection(
+async def problem_reflection(
     state: AutoMLAgentState, inference: AIInference, dataset: Dataset
 ):
     logger.info("Running problem reflection")
@@ -41,21 +44,21 @@ def problem_reflection(
         {
             "role": "user",
             "content": prompts.automl.problem_reflection_prompt(
-                data_files_and_content=dataset.dataset_preview(),
-                dataset_eda=dataset.dataset_eda(),
+                data_files_and_content=await asyncio.to_thread(dataset.dataset_preview),
+                dataset_eda=await asyncio.to_thread(dataset.dataset_eda),
             ),
         }
     )
-    reflection = inference.query(messages)
+    reflection = await inference.aquery(messages)
     return Command(update={"reflection": reflection})
 
 
-def generate_automl_config(
+async def generate_automl_config(
     state: AutoMLAgentState, inference: AIInference, dataset: Dataset
 ):
     logger.info("Running generate automl config")
 
-    config = inference.create(
+    config = await inference.acreate(
         prompts.automl.generate_configuration_prompt(
             reflection=state["reflection"],
         ),
@@ -85,14 +88,14 @@ def select_skeleton(state: AutoMLAgentState, dataset: Dataset, workspace: Path):
     return Command(update={"skeleton": code_template})
 
 
-def generate_code(state: AutoMLAgentState, inference: AIInference, dataset: Dataset):
+async def generate_code(state: AutoMLAgentState, inference: AIInference, dataset: Dataset):
     logger.info("Generating code")
     codegen_prompt = prompts.automl.code_generation_prompt(
         reflection=state["reflection"],
         skeleton=state["skeleton"],
         dataset_path=str(dataset.path.absolute()),
     )
-    code = inference.query(codegen_prompt)
+    code = await inference.aquery(codegen_prompt)
     extracted_code = extract_code(code)
     return Command(update={"raw_code": extracted_code})
 
@@ -113,7 +116,7 @@ def insert_templates(state: AutoMLAgentState):
                     "cv_folds": fedot_config.cv_folds,
                     "preset": f"'{fedot_config.preset.value}'",
                     "metric": f"'{fedot_config.metric.value}'",
-                    **load_config().fedot.predictor_init_kwargs,
+                    **config.fedot.predictor_init_kwargs,
                 }
             },
             config.fedot.templates.evaluate: {
@@ -156,10 +159,15 @@ def _generate_code_file(code: str, output_dir: Path):
     return output_dir / "solution.py"
 
 
-def evaluate(state: AutoMLAgentState, workspace: Path):
+async def evaluate(state: AutoMLAgentState, workspace: Path, writer: StreamWriter):
     logger.info("Running evaluate")
     code_path = _generate_code_file(state["code"], workspace)
-    observation = execute_code(path_to_run_code=code_path)
+    # Output reaches `custom` stream subscribers while the solution is still running
+    observation = await asyncio.to_thread(
+        execute_code,
+        path_to_run_code=code_path,
+        on_output=lambda stream, line: writer({"node": "evaluate", "stream": stream, "line": line}),
+    )
     if observation.error:
         logger.error(observation.stderr)
     logger.debug(
@@ -169,17 +177,15 @@ def evaluate(state: AutoMLAgentState, workspace: Path):
 
 
 def if_bug(state: AutoMLAgentState):
-    if (
-        state["observation"].error
-        and state["fix_attempts"] < load_config().fedot.fix_tries
-    ):
+    fix_tries = load_config().fedot.fix_tries
+    if state["observation"].error and state["fix_attempts"] < fix_tries:
         return True
-    if state["fix_attempts"] >= load_config().fedot.fix_tries:
+    if state["fix_attempts"] >= fix_tries:
         logger.error("Too many fix tries")
     return False
 
 
-def fix_solution(state: AutoMLAgentState, inference: AIInference, dataset: Dataset):
+async def fix_solution(state: AutoMLAgentState, inference: AIInference, dataset: Dataset):
     logger.info("Running fix solution")
 
     fix_prompt = prompts.automl.fix_solution_prompt(
@@ -191,14 +197,19 @@ def fix_solution(state: AutoMLAgentState, inference: AIInference, dataset: Datas
         stdout=state["observation"].stdout,
     )
 
-    fixed_solution = inference.query(fix_prompt)
+    fixed_solution = await inference.aquery(fix_prompt)
     extracted_code = extract_code(fixed_solution)
     return Command(
         update={"raw_code": extracted_code, "fix_attempts": state["fix_attempts"] + 1}
     )
 
 
-def extract_metrics(state: AutoMLAgentState, workspace: Path):
+async def extract_metrics(state: AutoMLAgentState, workspace: Path, pipelines: PipelineCache):
+    # Loading the pipeline is slow and blocking
+    return await asyncio.to_thread(_extract_metrics, state, workspace, pipelines)
+
+
+def _extract_metrics(state: AutoMLAgentState, workspace: Path, pipelines: PipelineCache):
     logger.info("Running extract_metrics")
 
     def _parse_metrics(raw_output: str) -> str | None:
@@ -211,11 +222,11 @@ def extract_metrics(state: AutoMLAgentState, workspace: Path):
         state["metrics"] = _parse_metrics(state["observation"].stdout)
         logger.info(f"Metrics: {state['metrics']}")
 
-        pipeline_path = workspace / "pipeline"
-        if pipeline_path.exists():
-            model = Fedot(problem="classification")
-            model.load(pipeline_path)
-            state["pipeline"] = graph_structure(model.current_pipeline)
+        if pipelines.exists():
+            loaded = pipelines.get()
+            if loaded.error is not None:
+                raise RuntimeError(loaded.error)
+            state["pipeline"] = loaded.structure
             logger.info(f"Pipeline: {state['pipeline']}")
         else:
             logger.warning("Pipeline not found at expected path")
@@ -228,7 +239,7 @@ def extract_metrics(state: AutoMLAgentState, workspace: Path):
     return state
 
 
-def run_tests(state: AutoMLAgentState, workspace: Path, inference: AIInference):
+async def run_tests(state: AutoMLAgentState, workspace: Path, inference: AIInference, pipelines: PipelineCache):
     logger.info("Running tests")
 
     def extract_metrics(raw_output: str) -> Observation:
@@ -239,19 +250,16 @@ def run_tests(state: AutoMLAgentState, workspace: Path, inference: AIInference):
             msg="Metrics not found. Check if you use `evaluate` function and it was executed successfully.",
         )
 
-    def extract_pipeline(workspace: Path) -> Observation:
-        pipeline_path = workspace / "pipeline"
-        if not pipeline_path.exists():
+    def extract_pipeline(pipelines: PipelineCache) -> Observation:
+        if not pipelines.exists():
             return Observation(
                 error=True,
                 msg="Pipeline not found. Check if you use `train_model` function and it was executed successfully.",
             )
-        try:
-            model = Fedot(problem="classification")
-            model.load(pipeline_path)
-            return Observation(error=False, msg=graph_structure(model.current_pipeline))
-        except Exception as e:
-            return Observation(error=True, msg=f"Pipeline loading failed: {str(e)}")
+        loaded = pipelines.get()
+        if loaded.error is not None:
+            return Observation(error=True, msg=f"Pipeline loading failed: {loaded.error}")
+        return Observation(error=False, msg=loaded.structure)
 
     def check_submission_file(workspace: Path) -> Observation:
         submission_file = workspace / "submission.csv"
@@ -262,7 +270,7 @@ def run_tests(state: AutoMLAgentState, workspace: Path, inference: AIInference):
             else f"Submission file not found. Check if you save submission file successfully to {submission_file}.",
         )
 
-    def test_submission_format(args: tuple) -> Observation:
+    async def test_submission_format(args: tuple) -> Observation:
         raw_output, inference = args
         submission_file = workspace / "submission.csv"
         print("DEBUG: RAW OUTPUT\n", raw_output)
@@ -292,84 +300,90 @@ def run_tests(state: AutoMLAgentState, workspace: Path, inference: AIInference):
             )
 
         try:
-            sample_df = pd.read_csv(sample_path)
-            submission_df = pd.read_csv(submission_file)
+            # Headers, a bounded sample and a streaming pass over the ids; the sample is parsed once per run
+            sample, submission = await asyncio.gather(
+                asyncio.to_thread(read_schema, sample_path),
+                asyncio.to_thread(read_schema, submission_file),
+            )
+            if problem := compare_schemas(submission, sample):
+                return Observation(error=True, msg=problem)
+        except Exception as e:
+            return Observation(
+                error=True, msg=f"Error validating submission format: {str(e)}"
+            )
 
-            if submission_df.empty:
-                return Observation(error=True, msg="Submission file is empty.")
+        # The LLM assertion is only worth its latency once the deterministic checks pass
+        return await assert_submission_format(submission.head, sample.head)
 
-            if not submission_df.columns.equals(sample_df.columns):
-                return Observation(
-                    error=True,
-                    msg=f"Submission file columns don't match. Expected: {list(sample_df.columns)}, Got: {list(submission_df.columns)}",
+    async def assert_submission_format(submission_df: pd.DataFrame, sample_df: pd.DataFrame) -> Observation:
+        # LLM validation for deeper format checking
+        try:
+            submission_sample = submission_df.head(3).to_string(
+                max_rows=3, max_cols=10
+            )
+            sample_submission_sample = sample_df.head(3).to_string(
+                max_rows=3, max_cols=10
+            )
+
+            result = await inference.aquery(
+                prompts.utils.ai_assert_prompt(
+                    var1=submission_sample,
+                    var2=sample_submission_sample,
+                    condition=(
+                        "Compare the submission file format with the sample submission file format to determine if they have the same structure by verifying the following:"
+                        "1. Column names match exactly. 2. Data types in corresponding columns are compatible. 3. The overall structure, including column order and presence, is consistent.\n"
+                        "IMPORTANT: \n"
+                        "1. Ignore differences in the values within the columns."
+                        "2. Focus solely on structure, column names, and data types."
+                    ),
                 )
+            )
 
-            if submission_df.shape[1] != sample_df.shape[1]:
+            if result.strip().lower() != "true":
                 return Observation(
                     error=True,
-                    msg=f"Submission file has wrong number of columns. Expected: {sample_df.shape[1]}, Got: {submission_df.shape[1]}",
+                    msg=f"Submission file format does not match expected format. Expected: {sample_submission_sample}, Got: {submission_sample}",
                 )
+        except Exception:
+            pass  # LLM validation is optional, pandas validation is sufficient
 
-            # LLM validation for deeper format checking
-            try:
-                submission_sample = submission_df.head(3).to_string(
-                    max_rows=3, max_cols=10
-                )
-                sample_submission_sample = sample_df.head(3).to_string(
-                    max_rows=3, max_cols=10
-                )
+        return Observation(error=False, msg="Submission file format is correct.")
 
-                result = inference.query(
-                    prompts.utils.ai_assert_prompt(
-                        var1=submission_sample,
-                        var2=sample_submission_sample,
-                        condition=(
-                            "Compare the submission file format with the sample submission file format to determine if they have the same structure by verifying the following:"
-                            "1. Column names match exactly. 2. Data types in corresponding columns are compatible. 3. The overall structure, including column order and presence, is consistent.\n"
-                            "IMPORTANT: \n"
-                            "1. Ignore differences in the values within the columns."
-                            "2. Focus solely on structure, column names, and data types."
-                        ),
-                    )
-                )
 
-                if result.strip().lower() != "true":
-                    return Observation(
-                        error=True,
-                        msg=f"Submission file format does not match expected format. Expected: {sample_submission_sample}, Got: {submission_sample}",
-                    )
-            except Exception:
-                pass  # LLM validation is optional, pandas validation is sufficient
-
-            return Observation(error=False, msg="Submission file format is correct.")
-
-        except Exception as e:
-            return Observation(
-                error=True, msg=f"Error validating submission format: {str(e)}"
-            )
 
     # Run all tests
     tests = [
         (extract_metrics, state["observation"].stdout),
-        (extract_pipeline, workspace),
+        (extract_pipeline, pipelines),
         (check_submission_file, workspace),
         (test_submission_format, (state["observation"].stdout, inference)),
     ]
 
-    for test_func, param in tests:
-        result = test_func(param)
+    async def timed(test_func, param) -> tuple[Observation, float]:
+        started = time.perf_counter()
+        with profiler.span(test_func.__name__, "check"):
+            if asyncio.iscoroutinefunction(test_func):
+                result = await test_func(param)
+            else:
+                result = await asyncio.to_thread(test_func, param)
+        return result, time.perf_counter() - started
+
+    # The checks are independent: the pipeline load and the LLM assertion overlap
+    results = await asyncio.gather(*(timed(test_func, param) for test_func, param in tests))
+    for (test_func, _), (result, elapsed) in zip(tests, results):
+        label = f"[{test_func.__name__}, {elapsed:.2f}s]"
         if result.error:
-            logger.error(f"Test failed: {result.msg}")
+            logger.error(f"Test failed {label}: {result.msg}")
             state["observation"].error = True
-            state["observation"].msg += f"\nTest failed: {result.msg}"
+            state["observation"].msg += f"\nTest failed {label}: {result.msg}"
         else:
-            logger.info(f"Test passed: {result.msg}")
-            state["observation"].msg += f"\nTest passed: {result.msg}"
+            logger.info(f"Test passed {label}: {result.msg}")
+            state["observation"].msg += f"\nTest passed {label}: {result.msg}"
 
     return state
 
 
-def generate_report(state: AutoMLAgentState, inference: AIInference):
+async def generate_report(state: AutoMLAgentState, inference: AIInference):
     if state["code"] and state["pipeline"]:
         messages = state["messages"]
         messages.append(
@@ -382,7 +396,7 @@ def generate_report(state: AutoMLAgentState, inference: AIInference):
                 ),
             }
         )
-        response = inference.query(convert_to_openai_messages(messages))
+        response = await inference.aquery(convert_to_openai_messages(messages))
     else:
         response = "Solution not found. Please try again."
     return Command(
@@ -0,0 +1,111 @@
+"""Submission files summarized without loading them whole.
+
+A `SubmissionSchema` holds the header, a bounded number of leading rows, the row
+count and an order-independent digest of the ID column (the first column). The
+header and sample come from one short read. Counting rows and hashing IDs stream
+only the ID column in Arrow record batches. Schemas are cached by file fingerprint,
+so the sample submission is parsed once per run, and an unchanged submission.csv is
+not parsed again.
+"""
+import threading
+from collections import OrderedDict
+from pathlib import Path
+from typing import List, Optional
+
+import numpy as np
+import pandas as pd
+import pyarrow as pa
+import pyarrow.csv as pa_csv
+from pydantic import BaseModel, ConfigDict
+
+from utils.fingerprint import file_fingerprint
+
+SAMPLE_ROWS = 100
+SCHEMA_CACHE_SIZE = 8
+
+
+class SubmissionSchema(BaseModel):
+    model_config = ConfigDict(arbitrary_types_allowed=True, frozen=True)
+
+    path: str
+    fingerprint: str
+    columns: List[str]
+    num_rows: int
+    id_digest: str
+    head: pd.DataFrame
+
+    @property
+    def id_column(self) -> Optional[str]:
+        return self.columns[0] if self.columns else None
+
+
+_schemas: "OrderedDict[str, SubmissionSchema]" = OrderedDict()
+_schemas_lock = threading.Lock()
+
+
+def _id_digest(path: Path, num_columns: int) -> tuple[int, str]:
+    if not num_columns:
+        return 0, ""
+    rows = 0
+    # Sum and xor of the hashes do not depend on the row order
+    total = np.uint64(0)
+    mixed = np.uint64(0)
+    # The ID column is picked by position: pandas renames blank and duplicate headers, Arrow does not
+    names = [f"column_{index}" for index in range(num_columns)]
+    try:
+        reader = pa_csv.open_csv(
+            path,
+            read_options=pa_csv.ReadOptions(column_names=names, skip_rows=1),
+            convert_options=pa_csv.ConvertOptions(include_columns=names[:1]),
+        )
+        for batch in reader:
+            hashes = pd.util.hash_pandas_object(batch.column(0).to_pandas(), index=False).to_numpy(dtype=np.uint64)
+            rows += len(hashes)
+            with np.errstate(over="ignore"):
+                total += hashes.sum(dtype=np.uint64)
+            mixed ^= np.bitwise_xor.reduce(hashes) if len(hashes) else np.uint64(0)
+    except pa.ArrowInvalid as e:
+        raise ValueError(f"{path.name} is not a consistent CSV file: {e}") from e
+    return rows, f"{int(total):016x}{int(mixed):016x}"
+
+
+def read_schema(path: Path | str, sample_rows: int = SAMPLE_ROWS) -> SubmissionSchema:
+    path = Path(path).resolve()
+    fingerprint = file_fingerprint(path)
+    with _schemas_lock:
+        schema = _schemas.get(str(path))
+        if schema is not None and schema.fingerprint == fingerprint:
+            _schemas.move_to_end(str(path))
+            return schema
+
+    head = pd.read_csv(path, nrows=sample_rows)
+    columns = [str(column) for column in head.columns]
+    num_rows, id_digest = _id_digest(path, len(columns))
+    schema = SubmissionSchema(
+        path=str(path),
+        fingerprint=fingerprint,
+        columns=columns,
+        num_rows=num_rows,
+        id_digest=id_digest,
+        head=head,
+    )
+    with _schemas_lock:
+        _schemas[str(path)] = schema
+        _schemas.move_to_end(str(path))
+        while len(_schemas) > SCHEMA_CACHE_SIZE:
+            _schemas.popitem(last=False)
+    return schema
+
+
+def compare_schemas(submission: SubmissionSchema, sample: SubmissionSchema) -> Optional[str]:
+    """Why the submission does not match the sample submission, or None if it does."""
+    if submission.num_rows == 0:
+        return "Submission file is empty."
+    if submission.columns != sample.columns:
+        return f"Submission file columns don't match. Expected: {sample.columns}, Got: {submission.columns}"
+    if submission.num_rows != sample.num_rows:
+        return f"Submission file has {submission.num_rows} rows, the sample submission has {sample.num_rows}."
+    if submission.id_digest != sample.id_digest:
+        return (f"Values of the `{sample.id_column}` column in the submission file differ from the sample submission. "
+                f"Keep the ids of the test data.")
+    return None
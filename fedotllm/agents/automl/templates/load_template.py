@@ -86,7 +86,7 @@ def _replace_placeholder_with_content(text: str, placeholder: str, content: str)
     Returns:
         str: The text with the placeholder replaced by the content.
     """
-    pattern = re.compile(rf"(?P<indent>^\s*)<%%\s*{re.escape(placeholder)}\s*%%>", re.MULTILINE)
+    pattern = re.compile(rf"(?P<indent>^[ \t]*)<%%\s*{re.escape(placeholder)}\s*%%>", re.MULTILINE)
     match = pattern.search(text)
     if match:
         indent = match.group("indent")
@@ -27,6 +27,9 @@ SUBMISSION_PATH = WORKSPACE_PATH / "submission.csv"
 EVAL_SET_SIZE = 0.2 # 20% of the data for evaluation
 ### UNMODIFIABLE CODE END ###
 
+<%% read_dataset.py %%>
+
+
 # --- TODO: Update these paths for your specific competition ---
 TRAIN_FILE = DATASET_PATH / "train.csv" # Replace with your actual filename
 TEST_FILE = DATASET_PATH / "test.csv" # Replace with your actual filename
@@ -38,11 +41,11 @@ TARGET_COLUMNS = ["target"] # Replace with your actual target column name(s)
 def load_data():
     """Loads train, test, and optionally sample submission files."""
     try:
-        train_df = pd.read_csv(TRAIN_FILE) # TODO: Adjust pandas loader if needed
-        test_df = pd.read_csv(TEST_FILE) # TODO: Adjust pandas loader if needed
+        train_df = read_dataset(TRAIN_FILE) # TODO: Adjust pandas loader if needed
+        test_df = read_dataset(TEST_FILE) # TODO: Adjust pandas loader if needed
         sample_sub_df = None
         if SAMPLE_SUBMISSION_FILE and (DATASET_PATH / SAMPLE_SUBMISSION_FILE).exists():
-           sample_sub_df = pd.read_csv(DATASET_PATH / SAMPLE_SUBMISSION_FILE) # TODO: Adjust pandas loader if needed
+           sample_sub_df = read_dataset(DATASET_PATH / SAMPLE_SUBMISSION_FILE) # TODO: Adjust pandas loader if needed
         else:
             print("Sample submission file not found or not specified.")
         print("Data loaded successfully.")
@@ -29,6 +29,10 @@ PIPELINE_PATH = WORKSPACE_PATH / "pipeline"  # path for saving and loading pipel
 SUBMISSION_PATH = WORKSPACE_PATH / "submission.csv"  # path for saving submission file
 EVAL_SET_SIZE = 0.2  # 20% of the data for evaluation
 ### UNMODIFIABLE CODE END ###
+
+<%% read_dataset.py %%>
+
+
 # --- TODO: Update these paths for your specific competition ---
 TRAIN_FILE = DATASET_PATH / "train.csv"  # Replace with your actual filename
 TEST_FILE = DATASET_PATH / "test.csv"  # Replace with your actual filename
@@ -39,7 +43,7 @@ SAMPLE_SUBMISSION_FILE = (
 
 # USER CODE BEGIN LOAD_DATA #
 def load_data():
-    # TODO: this function is for loading a dataset from user’s local storage
+    # TODO: this function is for loading a dataset from user’s local storage, use read_dataset for the files
     return train, X_test
 
 
@@ -0,0 +1,202 @@
+import hashlib
+import json
+import re
+import sqlite3
+import threading
+import time
+from abc import ABC, abstractmethod
+from collections import OrderedDict
+from contextlib import closing
+from pathlib import Path
+from typing import Any, Dict, List, Optional
+
+from fedotllm.log import logger
+
+# Parts of prompts that change between otherwise identical runs
+VOLATILE_PATTERNS = [
+    (re.compile(r"fedotllm-output-\d{8}_\d{6}"), "fedotllm-output-<timestamp>"),
+    (re.compile(r"/tmp/tmp[\w-]+"), "/tmp/<tmp>"),
+    (re.compile(r"\d{4}-\d{2}-\d{2}[ T]\d{2}:\d{2}:\d{2}(?:[.,]\d+)?"), "<datetime>"),
+]
+
+
+def normalize_text(text: str) -> str:
+    for pattern, replacement in VOLATILE_PATTERNS:
+        text = pattern.sub(replacement, text)
+    return " ".join(text.split())
+
+
+def cache_key(
+    model: str,
+    messages: List[Dict[str, Any]],
+    params: Dict[str, Any],
+    near_duplicates: bool = False,
+) -> str:
+    """Canonical hash of a completion request.
+
+    With `near_duplicates`, whitespace and volatile paths/timestamps are normalized,
+    so reruns in a fresh workspace hit the same entry. The cached answer may then
+    mention the old workspace path, which is why the mode is opt-in.
+    """
+    if near_duplicates:
+        messages = [
+            {**message, "content": normalize_text(message["content"])}
+            if isinstance(message.get("content"), str)
+            else message
+            for message in messages
+        ]
+    payload = json.dumps(
+        {"model": model, "messages": messages, "params": params},
+        sort_keys=True,
+        ensure_ascii=False,
+        default=str,
+    )
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+
+class ResponseCache(ABC):
+    @abstractmethod
+    def get(self, key: str) -> Optional[str]: ...
+
+    @abstractmethod
+    def set(self, key: str, response: str) -> None: ...
+
+    @abstractmethod
+    def delete(self, key: str) -> None: ...
+
+
+class MemoryCache(ResponseCache):
+    """In-process LRU cache with a TTL."""
+
+    def __init__(self, max_entries: int = 256, ttl: Optional[float] = None):
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self._entries: OrderedDict[str, tuple[float, str]] = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key: str) -> Optional[str]:
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+            created, response = entry
+            if self.ttl is not None and time.time() - created > self.ttl:
+                del self._entries[key]
+                return None
+            self._entries.move_to_end(key)
+            return response
+
+    def set(self, key: str, response: str, created: Optional[float] = None) -> None:
+        with self._lock:
+            self._entries[key] = (created or time.time(), response)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def delete(self, key: str) -> None:
+        with self._lock:
+            self._entries.pop(key, None)
+
+
+class SQLiteCache(ResponseCache):
+    """On-disk cache with a TTL, evicting least recently used entries over `max_size` bytes."""
+
+    def __init__(self, path: Path | str, ttl: Optional[float] = None, max_size: Optional[int] = None):
+        self.path = Path(path)
+        self.ttl = ttl
+        self.max_size = max_size
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        with closing(self._connect()) as conn, conn:
+            conn.execute(
+                "CREATE TABLE IF NOT EXISTS responses ("
+                "key TEXT PRIMARY KEY, response TEXT NOT NULL, "
+                "created REAL NOT NULL, accessed REAL NOT NULL, size INTEGER NOT NULL)"
+            )
+
+    def _connect(self) -> sqlite3.Connection:
+        return sqlite3.connect(self.path, timeout=30)
+
+    def get_entry(self, key: str) -> Optional[tuple[float, str]]:
+        now = time.time()
+        with closing(self._connect()) as conn, conn:
+            row = conn.execute(
+                "SELECT created, response FROM responses WHERE key = ?", (key,)
+            ).fetchone()
+            if row is None:
+                return None
+            if self.ttl is not None and now - row[0] > self.ttl:
+                conn.execute("DELETE FROM responses WHERE key = ?", (key,))
+                return None
+            conn.execute("UPDATE responses SET accessed = ? WHERE key = ?", (now, key))
+            return row
+
+    def get(self, key: str) -> Optional[str]:
+        entry = self.get_entry(key)
+        return entry[1] if entry else None
+
+    def set(self, key: str, response: str) -> None:
+        now = time.time()
+        with closing(self._connect()) as conn, conn:
+            conn.execute(
+                "INSERT OR REPLACE INTO responses VALUES (?, ?, ?, ?, ?)",
+                (key, response, now, now, len(response.encode("utf-8"))),
+            )
+            if self.ttl is not None:
+                conn.execute("DELETE FROM responses WHERE created < ?", (now - self.ttl,))
+            if self.max_size is not None:
+                total = conn.execute("SELECT COALESCE(SUM(size), 0) FROM responses").fetchone()[0]
+                if total > self.max_size:
+                    rows = conn.execute("SELECT key, size FROM responses ORDER BY accessed").fetchall()
+                    evicted = []
+                    for evicted_key, size in rows:
+                        if total <= self.max_size:
+                            break
+                        evicted.append((evicted_key,))
+                        total -= size
+                    conn.executemany("DELETE FROM responses WHERE key = ?", evicted)
+
+    def delete(self, key: str) -> None:
+        with closing(self._connect()) as conn, conn:
+            conn.execute("DELETE FROM responses WHERE key = ?", (key,))
+
+
+class TieredCache(ResponseCache):
+    """Memory LRU in front of the SQLite store."""
+
+    def __init__(self, memory: MemoryCache, disk: SQLiteCache):
+        self.memory = memory
+        self.disk = disk
+
+    def get(self, key: str) -> Optional[str]:
+        response = self.memory.get(key)
+        if response is not None:
+            return response
+        entry = self.disk.get_entry(key)
+        if entry is None:
+            return None
+        created, response = entry
+        self.memory.set(key, response, created=created)
+        return response
+
+    def set(self, key: str, response: str) -> None:
+        self.memory.set(key, response)
+        self.disk.set(key, response)
+
+    def delete(self, key: str) -> None:
+        self.memory.delete(key)
+        self.disk.delete(key)
+
+
+def build_response_cache(config) -> Optional[ResponseCache]:
+    """Create the cache described by an `LLMCacheConfig`, or None if it is disabled."""
+    if not config.enabled:
+        return None
+    memory = MemoryCache(max_entries=config.memory_entries, ttl=config.ttl)
+    if not config.path:
+        return memory
+    try:
+        disk = SQLiteCache(config.path, ttl=config.ttl, max_size=config.max_size * 1024 * 1024)
+    except sqlite3.Error as e:
+        logger.warning(f"LLM response cache at {config.path} is unavailable, using memory only: {e}")
+        return memory
+    return TieredCache(memory, disk)
@@ -1,6 +1,8 @@
-import io
+import hashlib
+import os
+import pickle
 from pathlib import Path
-from typing import List
+from typing import Dict, Iterator, List, Optional
 
 import pandas as pd
 from scipy.io.arff import loadarff
@@ -12,6 +14,17 @@ from fedotllm.constants import (
     EXCEL_SUFFIXES,
     PARQUET_SUFFIXES,
 )
+from fedotllm.data_profile import SAMPLE_ROWS, SplitProfile, profile_chunks
+from fedotllm.log import logger
+from utils.fingerprint import file_fingerprint
+
+# Rows per chunk when a split is scanned instead of loaded
+CHUNK_ROWS = 100_000
+# CSV files up to this size get an exact row count, larger ones an estimate
+CSV_EXACT_COUNT_LIMIT = 64 * 1024 * 1024
+CSV_SAMPLE_BYTES = 1024 * 1024
+# Dataset cache entries kept on disk, newest first
+DATASET_CACHE_ENTRIES = 64
 
 
 def load_pd(data):
@@ -58,46 +71,224 @@ def missing_values(df: pd.DataFrame) -> pd.DataFrame:
     return missing_df
 
 
+def _count_lines(path: Path, limit: Optional[int] = None) -> tuple[int, int]:
+    """Newline-terminated lines and bytes read, up to `limit` bytes."""
+    lines = read = 0
+    last = b"\n"
+    with path.open("rb") as f:
+        while limit is None or read < limit:
+            block = f.read(1 << 20 if limit is None else min(1 << 20, limit - read))
+            if not block:
+                break
+            lines += block.count(b"\n")
+            read += len(block)
+            last = block[-1:]
+    if limit is None and last != b"\n":
+        lines += 1
+    return lines, read
+
+
 class Split:
     """
     Split within dataset object
+
+    A split backed by a file only reads its schema and row count up front; the data
+    is loaded on the first access to `data`, or scanned chunk by chunk with `iter_chunks`
+    and summarized in a single pass by `profile`.
     """
 
-    def __init__(self, name: str, data: pd.DataFrame):
+    def __init__(self, name: str, data: Optional[pd.DataFrame] = None, path: Optional[Path] = None):
         self.name = name
-        self.data = data
+        self.path = path
+        self._data = data
+        self._columns: Optional[List[str]] = None
+        self._num_rows: Optional[int] = None
+        self._profile: Optional[SplitProfile] = None
+        self.num_rows_estimated = False
+
+    @property
+    def format(self) -> Optional[str]:
+        if self.path is None:
+            return None
+        if self.path.suffix in PARQUET_SUFFIXES:
+            return "parquet"
+        if self.path.suffix in CSV_SUFFIXES:
+            return "csv"
+        return "other"
+
+    @property
+    def data(self) -> pd.DataFrame:
+        if self._data is None:
+            self._data = load_pd(self.path)
+        return self._data
+
+    def _read_metadata(self):
+        if self._data is not None:
+            self._columns = self._data.columns.tolist()
+            self._num_rows = len(self._data)
+        elif self.format == "parquet":
+            import pyarrow.parquet as pq
+
+            metadata = pq.ParquetFile(self.path)
+            self._columns = [
+                name for name in metadata.schema_arrow.names
+                if name not in (metadata.schema_arrow.pandas_metadata or {}).get("index_columns", [])
+            ]
+            self._num_rows = metadata.metadata.num_rows
+        elif self.format == "csv":
+            header = pd.read_csv(self.path, nrows=0)
+            self._columns = header.columns.tolist()
+            size = self.path.stat().st_size
+            if size <= CSV_EXACT_COUNT_LIMIT:
+                self._num_rows = max(_count_lines(self.path)[0] - 1, 0)
+            else:
+                lines, read = _count_lines(self.path, CSV_SAMPLE_BYTES)
+                self._num_rows = int(size / read * lines) - 1
+                self.num_rows_estimated = True
+        else:
+            self._columns = self.data.columns.tolist()
+            self._num_rows = len(self.data)
+
+    @property
+    def columns(self) -> List[str]:
+        if self._columns is None:
+            self._read_metadata()
+        return self._columns
+
+    @property
+    def num_rows(self) -> int:
+        if self._num_rows is None:
+            self._read_metadata()
+        return self._num_rows
+
+    @property
+    def shape(self) -> tuple[int, int]:
+        return self.num_rows, len(self.columns)
+
+    def iter_chunks(self, chunk_rows: int = CHUNK_ROWS) -> Iterator[pd.DataFrame]:
+        if self._data is not None or self.format == "other":
+            yield self.data
+        elif self.format == "csv":
+            with pd.read_csv(self.path, chunksize=chunk_rows) as reader:
+                yield from reader
+        else:
+            import pyarrow.parquet as pq
+
+            for batch in pq.ParquetFile(self.path).iter_batches(batch_size=chunk_rows):
+                yield batch.to_pandas()
+
+    def profile(self, sample_rows: int = SAMPLE_ROWS) -> SplitProfile:
+        if self._profile is None or len(self._profile.sample) < min(sample_rows, self._profile.num_rows):
+            self._profile = profile_chunks(self.name, self.columns, self.iter_chunks(), sample_rows)
+            # The scan gives the exact count, replacing any estimate
+            self._num_rows = self._profile.num_rows
+            self.num_rows_estimated = False
+        return self._profile
 
 
 class Dataset:
-    def __init__(self, splits: List[Split], path: Path):
+    def __init__(self, splits: List[Split], path: Path, cache_path: Optional[Path] = None):
         self.splits = splits
         self.path = path
+        self.cache_path = cache_path
+        self._train_split: Optional[Split] = None
+        self._eda: Optional[str] = None
+        self._previews: Dict[int, str] = {}
 
     @classmethod
-    def from_path(cls, path: Path):
+    def from_path(cls, path: Path, cache_dir: Optional[Path | str] = None):
         """
         Load Dataset a folder with dataset objects
 
         Args:
             path: Path to folder with Dataset data
+            cache_dir: Where schemas, profiles, preview and EDA are kept between runs,
+                keyed by the path, size, mtime and a fast content hash of every file
         """
 
         # Loading all splits in folder
-        splits = []
         if path.is_dir():
-            files = [x for x in path.glob("**/*") if x.is_file()]
+            files = sorted(x for x in path.glob("**/*") if x.is_file())
         else:
             files = [path]
-        for file in files:
-            file_path = file.absolute()
-            if file_path.suffix in DATASET_EXTENSIONS:
-                file_dataframe = load_pd(file_path)
-                split = Split(data=file_dataframe, name=file.name)
-                splits.append(split)
+        files = [file.absolute() for file in files if file.suffix in DATASET_EXTENSIONS]
 
-        return Dataset(splits=splits, path=path)
+        cache_path = None
+        if cache_dir is not None:
+            digest = hashlib.sha256(str(path.resolve()).encode())
+            for file in files:
+                digest.update(f"\0{file}\0{file_fingerprint(file)}".encode())
+            cache_path = Path(cache_dir) / f"{digest.hexdigest()}.pkl"
+            dataset = cls._load_cache(cache_path, path)
+            if dataset is not None:
+                return dataset
+
+        splits = [Split(name=file.name, path=file) for file in files]
+        return Dataset(splits=splits, path=path, cache_path=cache_path)
+
+    @classmethod
+    def _load_cache(cls, cache_path: Path, path: Path) -> Optional["Dataset"]:
+        try:
+            with cache_path.open("rb") as f:
+                entry = pickle.load(f)
+        except FileNotFoundError:
+            return None
+        except Exception as e:
+            logger.warning(f"Ignoring unreadable dataset cache {cache_path}: {e}")
+            return None
+
+        splits = []
+        for state in entry["splits"]:
+            split = Split(name=state["name"], path=state["path"])
+            split._columns = state["columns"]
+            split._num_rows = state["num_rows"]
+            split.num_rows_estimated = state["num_rows_estimated"]
+            split._profile = state["profile"]
+            splits.append(split)
+        dataset = Dataset(splits=splits, path=path, cache_path=cache_path)
+        dataset._train_split = next((split for split in splits if split.name == entry["train_split"]), None)
+        dataset._eda = entry["eda"]
+        dataset._previews = entry["previews"]
+        os.utime(cache_path)
+        return dataset
+
+    def _save_cache(self):
+        if self.cache_path is None:
+            return
+        entry = {
+            "splits": [
+                {
+                    "name": split.name,
+                    "path": split.path,
+                    "columns": split._columns,
+                    "num_rows": split._num_rows,
+                    "num_rows_estimated": split.num_rows_estimated,
+                    "profile": split._profile,
+                }
+                for split in self.splits
+            ],
+            "train_split": self._train_split.name if self._train_split else None,
+            "eda": self._eda,
+            "previews": self._previews,
+        }
+        try:
+            self.cache_path.parent.mkdir(parents=True, exist_ok=True)
+            staging = self.cache_path.with_suffix(f".{os.getpid()}.tmp")
+            with staging.open("wb") as f:
+                pickle.dump(entry, f)
+            os.replace(staging, self.cache_path)
+            entries = sorted(self.cache_path.parent.glob("*.pkl"), key=lambda p: p.stat().st_mtime, reverse=True)
+            for stale in entries[DATASET_CACHE_ENTRIES:]:
+                stale.unlink(missing_ok=True)
+        except OSError as e:
+            logger.warning(f"Could not write dataset cache {self.cache_path}: {e}")
 
     def get_train_split(self):
+        if self._train_split is None:
+            self._train_split = self._find_train_split()
+        return self._train_split
+
+    def _find_train_split(self):
         # heuristics to find train split
         for split in self.splits:
             if "train" in split.name.lower():
@@ -105,14 +296,14 @@ class Dataset:
                 break
         else:
             # Find splits with max column count
-            max_cols = max(split.data.shape[1] for split in self.splits)
+            max_cols = max(len(split.columns) for split in self.splits)
             max_col_splits = [
-                split for split in self.splits if split.data.shape[1] == max_cols
+                split for split in self.splits if len(split.columns) == max_cols
             ]
 
             # If multiple splits have the same column count, take the one with more rows
             if len(max_col_splits) > 1:
-                train_split = max(max_col_splits, key=lambda split: split.data.shape[0])
+                train_split = max(max_col_splits, key=lambda split: split.num_rows)
             else:
                 train_split = max_col_splits[0]
         return train_split
@@ -121,39 +312,49 @@ class Dataset:
         """Generate exploratory data analysis summary only for the split with maximum columns."""
         if not self.splits:
             return "No data splits available"
+        if self._eda is not None:
+            return self._eda
         # heuristics to find train split
         train_split = self.get_train_split()
-        df = train_split.data
         eda = ""
-        if df.shape[1] <= 10:
+        if len(train_split.columns) <= 10:
+            profile = train_split.profile()
+            summary = profile.summary()
             eda += "\n===== 1. BASIC INFO =====\n"
-
-            buf = io.StringIO()
-            df.info(buf=buf)
-
-            info_str = buf.getvalue()
-            eda += info_str
+            eda += f"Rows: {profile.num_rows}, columns: {len(profile.columns)}\n"
+            eda += summary[["dtype", "non_null", "distinct", "min", "max", "mean"]].rename(
+                columns={"non_null": "non-null", "distinct": "distinct (approx.)"}
+            ).to_markdown()
+            eda += "\n"
 
             eda += "\n===== 2. MISSING VALUES =====\n"
-            eda += missing_values(df).to_markdown()
+            missing = summary["missing"][summary["missing"] > 0].sort_values(ascending=False)
+            missing_pct = (missing / max(profile.num_rows, 1)).round(3) * 100
+            eda += pd.DataFrame({"Missing": missing, "Percent": missing_pct}).to_markdown()
+        self._eda = eda
+        self._save_cache()
         return eda
 
     def dataset_preview(self, sample_size: int = 11):
+        if sample_size in self._previews:
+            return self._previews[sample_size]
         preview = ""
         train_split = self.get_train_split()
-        if train_split.data.shape[1] > 10:
+        if len(train_split.columns) > 10:
             preview += f"File: {train_split.name}\n"
-            preview += train_split.data.sample(sample_size).to_markdown()
+            preview += train_split.profile(sample_size).sample.head(sample_size).to_markdown()
             preview += "\n\n"
             for split in self.splits:
                 preview += f"File: {split.name}\n"
-                preview += f"Columns: {split.data.columns.tolist()}\n"
+                preview += f"Columns: {split.columns}\n"
                 preview += "\n\n"
         else:
             for split in self.splits:
                 preview += f"File: {split.name}\n"
-                preview += split.data.sample(sample_size).to_markdown()
+                preview += split.profile(sample_size).sample.head(sample_size).to_markdown()
             preview += "\n\n"
+        self._previews[sample_size] = preview
+        self._save_cache()
         return preview
 
     def __str__(self):
@@ -1,10 +1,24 @@
+import contextvars
 import os
+import re
+import resource
+import signal
 import subprocess
+import threading
+import time
+import uuid
 from pathlib import Path
+from typing import Callable, List, Optional
 
 from pydantic import BaseModel, Field
 
 from fedotllm.log import logger
+from utils.config.loader import load_config
+
+# How often the supervisor checks the limits of the running process group
+POLL_INTERVAL = 0.5
+PAGE_SIZE = os.sysconf("SC_PAGE_SIZE") if hasattr(os, "sysconf") else 4096
+CLOCK_TICKS = os.sysconf("SC_CLK_TCK") if hasattr(os, "sysconf") else 100
 
 
 class Observation(BaseModel):
@@ -12,23 +26,227 @@ class Observation(BaseModel):
     msg: str = Field(default="")
     stdout: str = Field(default="")
     stderr: str = Field(default="")
+    returncode: Optional[int] = Field(default=None)
+    killed: Optional[str] = Field(default=None)  # why the supervisor stopped the run
+
+
+def _group_usage(pgid: int) -> Optional[tuple[float, int]]:
+    """CPU seconds and resident bytes of the live processes of a group (Linux /proc only)."""
+    if not os.path.isdir("/proc"):
+        return None
+    cpu = 0.0
+    rss = 0
+    for entry in os.scandir("/proc"):
+        if not entry.name.isdigit():
+            continue
+        try:
+            with open(f"/proc/{entry.name}/stat", "rb") as f:
+                # Fields after the command name, which may contain spaces
+                fields = f.read().rsplit(b")", 1)[1].split()
+        except OSError:
+            continue
+        if int(fields[2]) != pgid:
+            continue
+        cpu += (int(fields[11]) + int(fields[12])) / CLOCK_TICKS
+        rss += int(fields[21]) * PAGE_SIZE
+    return cpu, rss
+
+
+def _create_cgroup(root: str, rss_limit: Optional[int]) -> Optional[Path]:
+    path = Path(root) / f"lads-{os.getpid()}-{uuid.uuid4().hex[:8]}"
+    try:
+        path.mkdir()
+        if rss_limit:
+            (path / "memory.max").write_text(str(rss_limit * 1024 * 1024))
+        return path
+    except OSError as e:
+        logger.warning(f"Could not create cgroup under {root}: {e}")
+        return None
+
+
+def _oom_killed(path: Path) -> bool:
+    try:
+        events = dict(line.split() for line in (path / "memory.events").read_text().splitlines())
+    except (OSError, ValueError):
+        return False
+    return int(events.get("oom_kill", 0)) > 0
+
+
+def _remove_cgroup(path: Path):
+    try:
+        (path / "cgroup.kill").write_text("1")
+    except OSError:
+        pass
+    for _ in range(50):
+        try:
+            path.rmdir()
+            return
+        except OSError:
+            time.sleep(0.1)
+    logger.warning(f"Could not remove cgroup {path}")
 
 
-def execute_code(path_to_run_code: Path) -> Observation:
+def _set_rlimits(limits):
+    # Runs in the child between fork and exec, so it only makes system calls
+    if limits.memory_limit:
+        limit = limits.memory_limit * 1024 * 1024
+        resource.setrlimit(resource.RLIMIT_AS, (limit, limit))
+    if limits.cpu_timeout:
+        # Per process; the supervisor enforces the total over the group
+        seconds = int(limits.cpu_timeout) + 1
+        resource.setrlimit(resource.RLIMIT_CPU, (seconds, seconds + int(limits.kill_grace) + 1))
+
+
+def _kill_group(pgid: int, grace: float, process: subprocess.Popen):
     try:
-        result = subprocess.run(
-            ["python3", "-W", "ignore", path_to_run_code],
-            capture_output=True,
+        os.killpg(pgid, signal.SIGTERM)
+        process.wait(timeout=grace)
+    except ProcessLookupError:
+        return
+    except subprocess.TimeoutExpired:
+        pass
+    try:
+        os.killpg(pgid, signal.SIGKILL)
+    except ProcessLookupError:
+        pass
+
+
+class FatalOutputWatcher:
+    """Recognizes output after which a solution cannot succeed.
+
+    Only lines matching one of the fatal patterns count, which should be errors no
+    code can handle, such as a corrupted CUDA context or an interpreter abort.
+    Exceptions, even printed with a traceback, may be caught and are left to the
+    exit code.
+    """
+
+    def __init__(self, patterns: List[str]):
+        self.patterns = [re.compile(pattern) for pattern in patterns]
+
+    def __call__(self, stream: str, line: str) -> Optional[str]:
+        for pattern in self.patterns:
+            if pattern.search(line):
+                return f"fatal error in the output: {line.strip()}"
+        return None
+
+
+def _pump(stream, chunks: list, name: str, on_output, watcher, abort: list):
+    for line in iter(stream.readline, ""):
+        chunks.append(line)
+        if on_output is not None:
+            try:
+                on_output(name, line)
+            except Exception as e:
+                logger.debug(f"Output callback failed: {e}")
+        if watcher is not None and not abort and (reason := watcher(name, line)):
+            abort.append(reason)
+    stream.close()
+
+
+def execute_code(
+    path_to_run_code: Path,
+    on_output: Optional[Callable[[str, str], None]] = None,
+    limits=None,
+    watcher: Optional[Callable[[str, str], Optional[str]]] = None,
+) -> Observation:
+    """Run a solution under wall-clock, CPU and memory limits.
+
+    The solution and everything it starts share one process group, which is killed
+    as a whole when a limit is hit and cleaned up after a normal exit as well.
+    `on_output(stream, line)` is called for every line as it is printed. The run is
+    also stopped as soon as `watcher(stream, line)` (by default a
+    `FatalOutputWatcher`) returns a reason, so a fix can start before the solution
+    would have finished.
+    """
+    limits = limits or load_config().fedot.execution
+    if watcher is None and limits.abort_on_fatal_output:
+        watcher = FatalOutputWatcher(limits.fatal_patterns)
+    cgroup = _create_cgroup(limits.cgroup_root, limits.rss_limit) if limits.cgroup_root else None
+    stdout, stderr = [], []
+    abort: List[str] = []
+    killed = None
+    try:
+        process = subprocess.Popen(
+            ["python3", "-W", "ignore", "-u", path_to_run_code],
+            stdout=subprocess.PIPE,
+            stderr=subprocess.PIPE,
             text=True,
-            preexec_fn=os.setsid,
-        )
-        logger.debug(f"stdout:\n{result.stdout}\nstderr:\n{result.stderr}")
-        return Observation(
-            error=result.returncode != 0, stdout=result.stdout, stderr=result.stderr
+            errors="replace",
+            bufsize=1,
+            start_new_session=True,
+            preexec_fn=(lambda: _set_rlimits(limits)) if limits.memory_limit or limits.cpu_timeout else None,
         )
     except Exception as e:
+        if cgroup is not None:
+            _remove_cgroup(cgroup)
         stderr = f"An unexpected error occurred in the execution harness: {type(e).__name__}: {e}"
         logger.error(
             f"Unexpected error executing {path_to_run_code}: {e}", exc_info=True
         )
         return Observation(error=True, stdout="", stderr=stderr)
+    if cgroup is not None:
+        # Moved while the interpreter is still starting, so the processes it starts inherit the cgroup
+        try:
+            (cgroup / "cgroup.procs").write_text(str(process.pid))
+        except OSError as e:
+            logger.warning(f"Could not move {process.pid} into cgroup {cgroup}: {e}")
+            _remove_cgroup(cgroup)
+            cgroup = None
+
+    # Callbacks run in the caller's context (e.g. to reach a LangGraph stream writer)
+    pumps = [
+        threading.Thread(target=contextvars.copy_context().run, args=(_pump, pipe, chunks, name, on_output, watcher, abort),
+                         daemon=True)
+        for pipe, chunks, name in ((process.stdout, stdout, "stdout"), (process.stderr, stderr, "stderr"))
+    ]
+    for pump in pumps:
+        pump.start()
+
+    started = time.monotonic()
+    try:
+        while process.poll() is None:
+            if abort:
+                killed = abort[0]
+            elif limits.wall_timeout and time.monotonic() - started > limits.wall_timeout:
+                killed = f"wall-clock limit of {limits.wall_timeout:g} s exceeded"
+            elif limits.cpu_timeout or limits.rss_limit:
+                usage = _group_usage(process.pid)
+                if usage is not None:
+                    cpu, rss = usage
+                    if limits.cpu_timeout and cpu > limits.cpu_timeout:
+                        killed = f"CPU time limit of {limits.cpu_timeout:g} s exceeded"
+                    elif limits.rss_limit and rss > limits.rss_limit * 1024 * 1024:
+                        killed = f"memory limit of {limits.rss_limit} MB exceeded ({rss / 2 ** 20:.0f} MB resident)"
+            if killed:
+                logger.warning(f"Stopping {path_to_run_code}: {killed}")
+                break
+            try:
+                process.wait(timeout=POLL_INTERVAL)
+            except subprocess.TimeoutExpired:
+                pass
+    finally:
+        # Also reaps workers the solution left behind after a normal exit
+        _kill_group(process.pid, limits.kill_grace if killed else 0, process)
+        process.wait()
+        for pump in pumps:
+            pump.join(timeout=limits.kill_grace)
+        if cgroup is not None:
+            if killed is None and _oom_killed(cgroup):
+                killed = f"memory limit of {limits.rss_limit} MB exceeded (killed by the kernel)"
+            _remove_cgroup(cgroup)
+
+    if killed is None and process.returncode == -signal.SIGXCPU:
+        killed = f"CPU time limit of {limits.cpu_timeout:g} s exceeded"
+    stderr_text = "".join(stderr)
+    if killed:
+        stderr_text += f"\nExecution stopped: {killed}."
+    result = Observation(
+        error=process.returncode != 0 or killed is not None,
+        msg=f"Execution stopped early: {killed}. The output below is partial." if killed else "",
+        stdout="".join(stdout),
+        stderr=stderr_text,
+        returncode=process.returncode,
+        killed=killed,
+    )
+    logger.debug(f"stdout:\n{result.stdout}\nstderr:\n{result.stderr}")
+    return result
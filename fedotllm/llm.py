@@ -1,14 +1,21 @@
+import asyncio
 import os
-from typing import Any, Dict, List, Optional, Type, TypeVar
+import threading
+import time
+from contextlib import asynccontextmanager
+from typing import Any, Dict, List, Optional, Tuple, Type, TypeVar
 
 import litellm
 from pydantic import BaseModel
-from tenacity import retry, stop_after_attempt, wait_exponential
+from tenacity import retry, retry_if_not_exception_type, stop_after_attempt, wait_exponential, wait_random_exponential
 
 from fedotllm import prompts
 from fedotllm.agents.utils import parse_json
+from fedotllm.cache import ResponseCache, build_response_cache, cache_key
 from fedotllm.log import logger
+from utils import profiler
 from utils.config.loader import load_config
+from utils.llm_replay import ReplayMissError, get_cassette
 
 from dotenv import load_dotenv
 load_dotenv()
@@ -26,6 +33,36 @@ if LANGFUSE_PUBLIC_KEY and LANGFUSE_SECRET_KEY:
     litellm.success_callback = ["langfuse"]
     litellm.failure_callback = ["langfuse"]
 
+# Process-wide, so calls from every thread and event loop (each asyncio.run of a
+# session has its own) share the provider limit. Keyed on the limit as well, so a
+# changed `max_concurrent_requests` takes effect for new requests
+_provider_semaphores: Dict[Tuple[str, int], threading.BoundedSemaphore] = {}
+_provider_semaphores_lock = threading.Lock()
+# Longest pause between attempts of an async caller to take a slot
+ACQUIRE_POLL_INTERVAL = 0.1
+
+
+def _provider_semaphore(provider: str, limit: int) -> threading.BoundedSemaphore:
+    with _provider_semaphores_lock:
+        if (provider, limit) not in _provider_semaphores:
+            _provider_semaphores[provider, limit] = threading.BoundedSemaphore(limit)
+        return _provider_semaphores[provider, limit]
+
+
+@asynccontextmanager
+async def _provider_slot(provider: str, limit: int):
+    # Polled rather than awaited in a thread: a cancelled waiter cannot take a slot later,
+    # and waiters do not tie up the default executor
+    semaphore = _provider_semaphore(provider, limit)
+    delay = 0.005
+    while not semaphore.acquire(blocking=False):
+        await asyncio.sleep(delay)
+        delay = min(delay * 2, ACQUIRE_POLL_INTERVAL)
+    try:
+        yield
+    finally:
+        semaphore.release()
+
 
 class AIInference:
     def __init__(
@@ -34,6 +71,7 @@ class AIInference:
         base_url: str | None = None,
         provider: str | None = None,
         model: str | None = None,
+        cache: ResponseCache | None = None,
     ):
         settings = load_config()
         self.base_url = base_url or settings.fedot.base_url
@@ -42,7 +80,8 @@ class AIInference:
         self.provider = provider or settings.fedot.provider
         if self.provider:
             self.model = f"{self.provider}/{self.model}"
-        if not self.api_key:
+        self.cassette = get_cassette(settings.replay)
+        if not self.api_key and not (self.cassette and self.cassette.replaying):
             raise Exception(
                 "API key not provided and OPENAI_API_KEY environment variable not set"
             )
@@ -54,38 +93,156 @@ class AIInference:
             # "max_completion_tokens": 8000,
             "extra_headers": {"X-Title": "FEDOT.LLM"},
         }
+        self.cache = cache if cache is not None else build_response_cache(settings.fedot.cache)
+        self.near_duplicates = settings.fedot.cache.near_duplicates
+        self.max_concurrent_requests = settings.fedot.max_concurrent_requests
+
+    @staticmethod
+    def _as_messages(messages: str | List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+        return (
+            [{"role": "user", "content": messages}]
+            if isinstance(messages, str)
+            else messages
+        )
+
+    def _cache_key(self, messages: List[Dict[str, Any]]) -> str:
+        params = {
+            key: value
+            for key, value in self.completion_params.items()
+            if key not in ("model", "api_key", "extra_headers")
+        }
+        return cache_key(self.model, messages, params, self.near_duplicates)
+
+    def _replayed(self, messages: List[Dict[str, Any]]) -> str:
+        entry = self.cassette.replay("inference", messages)
+        usage = entry.get("usage") or {}
+        profiler.record(prompt_tokens=usage.get("prompt_tokens", 0), completion_tokens=usage.get("completion_tokens", 0))
+        return entry["content"]
+
+    def _recorded(self, messages: List[Dict[str, Any]], content: str | None, response=None, elapsed: float = 0.0):
+        if self.cassette is not None and self.cassette.recording and content:
+            usage = getattr(response, "usage", None)
+            self.cassette.record("inference", self.model, messages, content, {
+                "prompt_tokens": getattr(usage, "prompt_tokens", 0) or 0,
+                "completion_tokens": getattr(usage, "completion_tokens", 0) or 0,
+            } if usage is not None else {}, elapsed=elapsed)
+        return content
+
+    def _validate(self, messages: str, response: str | None, response_model: Type[T]) -> T:
+        json_obj = parse_json(response) if response else None
+        try:
+            return response_model.model_validate(json_obj)
+        except Exception:
+            # Do not let the retry read the same unusable answer back from the cache
+            if self.cache is not None:
+                self.cache.delete(self._cache_key(self._as_messages(messages)))
+            raise
+
+    @staticmethod
+    def _record_usage(response):
+        usage = getattr(response, "usage", None)
+        if usage is not None:
+            profiler.record(
+                prompt_tokens=getattr(usage, "prompt_tokens", 0) or 0,
+                completion_tokens=getattr(usage, "completion_tokens", 0) or 0,
+            )
 
     @retry(
         stop=stop_after_attempt(5),
         wait=wait_exponential(multiplier=1, min=4, max=10),
         reraise=True,
+        retry=retry_if_not_exception_type(ReplayMissError),
+        before_sleep=profiler.record_retry,
     )
     def create(self, messages: str, response_model: Type[T]) -> T:
         messages = f"{messages}\n{prompts.utils.structured_response(response_model)}"
-        response = self.query(messages)
-        json_obj = parse_json(response) if response else None
-        return response_model.model_validate(json_obj)
+        return self._validate(messages, self.query(messages), response_model)
+
+    @retry(
+        stop=stop_after_attempt(5),
+        wait=wait_random_exponential(multiplier=1, min=4, max=10),
+        reraise=True,
+        retry=retry_if_not_exception_type(ReplayMissError),
+        before_sleep=profiler.record_retry,
+    )
+    async def acreate(self, messages: str, response_model: Type[T]) -> T:
+        messages = f"{messages}\n{prompts.utils.structured_response(response_model)}"
+        response = await self.aquery(messages)
+        # Validation may delete the cache entry, which is disk I/O
+        return await asyncio.to_thread(self._validate, messages, response, response_model)
 
     @retry(
         stop=stop_after_attempt(5),
         wait=wait_exponential(multiplier=1, min=4, max=10),
         reraise=True,
+        retry=retry_if_not_exception_type(ReplayMissError),
+        before_sleep=profiler.record_retry,
     )
     def query(self, messages: str | List[Dict[str, Any]]) -> str | None:
-        messages = (
-            [{"role": "user", "content": messages}]
-            if isinstance(messages, str)
-            else messages
-        )
+        with profiler.span(self.model, "llm"):
+            return self._query(messages)
+
+    def _query(self, messages: str | List[Dict[str, Any]]) -> str | None:
+        messages = self._as_messages(messages)
+        if self.cassette is not None and self.cassette.replaying:
+            return self._replayed(messages)
+        key = self._cache_key(messages) if self.cache is not None else None
+        if key is not None and (cached := self.cache.get(key)) is not None:
+            logger.debug("Serving LLM response from cache: %s", cached)
+            profiler.record(cached=True)
+            return self._recorded(messages, cached)
+
         logger.debug("Sending messages to LLM: %s", messages)
-        response = litellm.completion(
-            messages=messages,
-            **self.completion_params,
-        )
-        logger.debug(
-            "Received response from LLM: %s", response.choices[0].message.content
-        )
-        return response.choices[0].message.content
+        queued = started = time.perf_counter()
+        with _provider_semaphore(self.provider, self.max_concurrent_requests):
+            profiler.record(queue_time=time.perf_counter() - queued)
+            response = litellm.completion(
+                messages=messages,
+                **self.completion_params,
+            )
+        self._record_usage(response)
+        content = response.choices[0].message.content
+        logger.debug("Received response from LLM: %s", content)
+        if key is not None and content:
+            self.cache.set(key, content)
+        return self._recorded(messages, content, response, time.perf_counter() - started)
+
+    @retry(
+        stop=stop_after_attempt(5),
+        wait=wait_random_exponential(multiplier=1, min=4, max=10),
+        reraise=True,
+        retry=retry_if_not_exception_type(ReplayMissError),
+        before_sleep=profiler.record_retry,
+    )
+    async def aquery(self, messages: str | List[Dict[str, Any]]) -> str | None:
+        with profiler.span(self.model, "llm"):
+            return await self._aquery(messages)
+
+    async def _aquery(self, messages: str | List[Dict[str, Any]]) -> str | None:
+        # The response cache and the cassette do blocking disk I/O; keep it off the event loop
+        messages = self._as_messages(messages)
+        if self.cassette is not None and self.cassette.replaying:
+            return await asyncio.to_thread(self._replayed, messages)
+        key = self._cache_key(messages) if self.cache is not None else None
+        if key is not None and (cached := await asyncio.to_thread(self.cache.get, key)) is not None:
+            logger.debug("Serving LLM response from cache: %s", cached)
+            profiler.record(cached=True)
+            return await asyncio.to_thread(self._recorded, messages, cached)
+
+        logger.debug("Sending messages to LLM: %s", messages)
+        queued = started = time.perf_counter()
+        async with _provider_slot(self.provider, self.max_concurrent_requests):
+            profiler.record(queue_time=time.perf_counter() - queued)
+            response = await litellm.acompletion(
+                messages=messages,
+                **self.completion_params,
+            )
+        self._record_usage(response)
+        content = response.choices[0].message.content
+        logger.debug("Received response from LLM: %s", content)
+        if key is not None and content:
+            await asyncio.to_thread(self.cache.set, key, content)
+        return await asyncio.to_thread(self._recorded, messages, content, response, time.perf_counter() - started)
 
 
 if __name__ == "__main__":
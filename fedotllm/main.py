@@ -1,3 +1,4 @@
+import asyncio
 from pathlib import Path
 from typing import Any, AsyncIterator, Callable, List, Optional
 
@@ -10,6 +11,7 @@ from fedotllm.agents.translator import TranslatorAgent
 from fedotllm.data import Dataset
 from fedotllm.llm import AIInference
 from fedotllm.log import logger
+from utils.config.loader import load_config
 
 
 
@@ -35,7 +37,10 @@ class FedotAI:
             workspace = Path(workspace)
         self.workspace = workspace
 
-    def ainvoke(self, message: str):
+    def invoke(self, message: str):
+        return asyncio.run(self.ainvoke(message))
+
+    async def ainvoke(self, message: str):
         logger.info(
             f"FedotAI ainvoke called. Input message (first 100 chars): '{message[:100]}...'"
         )
@@ -45,11 +50,17 @@ class FedotAI:
             )
             logger.info(f"Workspace for ainvoke created at: {self.workspace}")
 
-        dataset = Dataset.from_path(self.task_path)
+        dataset = await asyncio.to_thread(
+            Dataset.from_path,
+            self.task_path,
+            cache_dir=load_config().fedot.dataset_cache_dir,
+        )
         translator_agent = TranslatorAgent(inference=self.inference)
 
         logger.info("FedotAI ainvoke: Translating input message to English.")
-        translated_message = translator_agent.translate_input_to_english(message)
+        translated_message = await asyncio.to_thread(
+            translator_agent.translate_input_to_english, message
+        )
         logger.info(
             f"FedotAI ainvoke: Input message translated to (first 100 chars): '{translated_message[:100]}...'"
         )
@@ -58,14 +69,18 @@ class FedotAI:
             inference=self.inference, dataset=dataset, workspace=self.workspace
         ).create_graph()
 
-        raw_response = automl_agent.invoke(
+        raw_response = await automl_agent.ainvoke(
             {"messages": [HumanMessage(content=translated_message)]}
         )
 
         logger.debug(
             f"FedotAI ainvoke: Raw response from SupervisorAgent: {raw_response}"
         )
+        return await asyncio.to_thread(
+            self._translate_response, raw_response, translator_agent
+        )
 
+    def _translate_response(self, raw_response, translator_agent: TranslatorAgent):
         if (
             raw_response
             and "messages" in raw_response
@@ -0,0 +1,176 @@
+"""Parallel candidate solutions for the code generator.
+
+With `code_candidates` > 1 the code generator asks for several solutions at once,
+each with its own sampling temperature and, after the first, a hint to take a
+different approach. Every candidate is run as soon as it is generated, in a
+private directory (with `candidate_shared_paths` linked in) so candidates do not
+overwrite each other's files. The first candidate that runs cleanly wins, or with
+`candidate_selection: best` the one reporting the best `candidate_metric`. The
+winner's files are copied into the working directory and its execution result is
+handed to the executor node, which then does not run the code again. Candidates
+still running at that point are killed, so they do not hold on to pool workers.
+"""
+import os
+import re
+import time
+import shutil
+import logging
+import tempfile
+import contextvars
+from pathlib import Path
+from typing import Any, Dict, List, Optional, Tuple
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+
+from langchain_core.messages import BaseMessage
+from langgraph.constants import TAG_NOSTREAM
+from pydantic import BaseModel, ConfigDict
+
+from graph.code_executor_node import PYTHON_REGEX, matplotlib_setup
+from graph.worker_pool import Cancellation, ExecutionResult, run_python_file
+from utils import profiler
+
+logger = logging.getLogger(__name__)
+
+CANDIDATE_HINTS = {
+    'ru': "Это вариант решения №{number}: выбери подход, отличающийся от самого очевидного.",
+    'en': "This is solution variant #{number}: choose an approach different from the most obvious one.",
+}
+
+
+class Candidate(BaseModel):
+    model_config = ConfigDict(arbitrary_types_allowed=True)
+
+    index: int
+    message: BaseMessage
+    code: str
+    execution: Optional[ExecutionResult] = None
+    score: Optional[float] = None
+    workdir: Optional[Path] = None
+
+    @property
+    def succeeded(self) -> bool:
+        return self.execution is not None and self.execution.returncode == 0
+
+
+def candidate_code(content: str) -> str:
+    """The code the executor node would run for this answer."""
+    code_blocks = re.findall(PYTHON_REGEX, content, re.DOTALL | re.MULTILINE)
+    return matplotlib_setup + "\n".join(code_blocks) + "\nplt.close('all')"
+
+
+def metric_score(stdout: str, metric: Optional[str], greater_is_better: bool = True) -> Optional[float]:
+    if not metric:
+        return None
+    values = re.findall(fr"{re.escape(metric)}\W{{0,3}}\s*[:=]\s*(-?[0-9]*\.?[0-9]+)", stdout, re.IGNORECASE)
+    if not values:
+        return None
+    return float(values[-1]) if greater_is_better else -float(values[-1])
+
+
+def _prepare_workdir(root: Path, shared_paths: List[str]) -> Path:
+    root.mkdir(parents=True, exist_ok=True)
+    workdir = Path(tempfile.mkdtemp(prefix='candidate_', dir=root))
+    for name in shared_paths:
+        source = Path(name).resolve()
+        if source.exists():
+            os.symlink(source, workdir / name, target_is_directory=source.is_dir())
+    return workdir
+
+
+def _adopt_outputs(workdir: Path, shared_paths: List[str]):
+    """Copy the files a candidate produced into the working directory."""
+    for entry in workdir.iterdir():
+        if entry.name in shared_paths or entry.is_symlink():
+            continue
+        if entry.is_dir():
+            shutil.copytree(entry, entry.name, dirs_exist_ok=True)
+        else:
+            shutil.copy2(entry, entry.name)
+
+
+def _run_candidate(index: int, prompt_template, llm, inputs: Dict[str, Any], temperature: Optional[float],
+                   config, cancel: Cancellation) -> Candidate:
+    with profiler.span(f'candidate_{index}', 'candidate'):
+        chain = prompt_template | (llm.bind(temperature=temperature) if temperature is not None else llm)
+        # Parallel answers would interleave in the token stream of the node
+        message = chain.invoke(inputs, config={'tags': [TAG_NOSTREAM]})
+        candidate = Candidate(index=index, message=message, code=candidate_code(message.content))
+        if not re.search(PYTHON_REGEX, message.content, re.DOTALL) or cancel.cancelled:
+            return candidate
+
+        candidate.workdir = _prepare_workdir(Path(config.candidate_dir), config.candidate_shared_paths)
+        with tempfile.NamedTemporaryFile(mode='w', suffix='.py', delete=False) as code_file:
+            code_file.write(candidate.code)
+        try:
+            with profiler.span('python', 'exec'):
+                execution = run_python_file(code_file.name, config, cwd=str(candidate.workdir), cancel=cancel)
+                profiler.record(queue_time=execution.queue_time, cpu_user=execution.cpu_user,
+                                cpu_system=execution.cpu_system, max_rss=execution.max_rss)
+        finally:
+            os.unlink(code_file.name)
+        candidate.execution = execution
+        candidate.score = metric_score(execution.stdout, config.candidate_metric, config.candidate_greater_is_better)
+        return candidate
+
+
+def _discard(candidate: Candidate):
+    if candidate.workdir is not None:
+        shutil.rmtree(candidate.workdir, ignore_errors=True)
+
+
+def _rank(candidate: Candidate) -> Tuple:
+    # Clean runs first, then the best score, then the earliest candidate
+    return (not candidate.succeeded, candidate.score is None, -(candidate.score or 0.0), candidate.index)
+
+
+def generate_candidates(prompt_template, llm, inputs: Dict[str, Any], config) -> Candidate:
+    """Generate and run `config.code_candidates` solutions in parallel and return the selected one."""
+    hint = CANDIDATE_HINTS[config.prompt_language]
+    temperatures = config.candidate_temperatures or [None]
+    started = time.perf_counter()
+
+    executor = ThreadPoolExecutor(max_workers=config.code_candidates, thread_name_prefix='candidate')
+    cancel = Cancellation()
+    futures = []
+    for index in range(config.code_candidates):
+        candidate_inputs = dict(inputs)
+        if index:
+            candidate_inputs['user_input'] = f"{inputs['user_input']}\n\n{hint.format(number=index + 1)}"
+        futures.append(executor.submit(
+            contextvars.copy_context().run, _run_candidate, index, prompt_template, llm, candidate_inputs,
+            temperatures[index % len(temperatures)], config, cancel,
+        ))
+
+    finished: List[Candidate] = []
+    pending = set(futures)
+    selected = None
+    while pending and selected is None:
+        done, pending = wait(pending, return_when=FIRST_COMPLETED)
+        for future in done:
+            try:
+                finished.append(future.result())
+            except Exception as e:
+                logger.warning(f"Candidate failed to generate: {e}")
+        if config.candidate_selection == 'first_success':
+            selected = next((c for c in sorted(finished, key=lambda c: c.index) if c.succeeded), None)
+
+    # Candidates still running are killed and not waited for; their directories go when they finish
+    cancel.cancel()
+    for future in pending:
+        future.add_done_callback(lambda f: not f.cancelled() and f.exception() is None and _discard(f.result()))
+    executor.shutdown(wait=False, cancel_futures=True)
+
+    if not finished:
+        raise RuntimeError("No code candidate could be generated")
+    selected = selected or min(finished, key=_rank)
+    logger.info(
+        f"Selected candidate {selected.index + 1} of {config.code_candidates} "
+        f"({len(finished)} finished, {'ok' if selected.succeeded else 'failed'}, "
+        f"score {selected.score}) in {time.perf_counter() - started:.1f}s"
+    )
+
+    if selected.succeeded:
+        _adopt_outputs(selected.workdir, config.candidate_shared_paths)
+    for candidate in finished:
+        _discard(candidate)
+    return selected
@@ -4,9 +4,16 @@ import sys
 import json
 import tempfile
 import subprocess
+import contextvars
+from concurrent.futures import ThreadPoolExecutor
 
 from graph.state import AgentState
+from graph.execution_cache import get_execution_cache, is_cacheable
+from graph.execution_planner import depends_on
+from graph.worker_pool import ExecutionResult, children_usage, run_python_file, usage_since
 from langchain_core.messages import AIMessage
+from utils.config.loader import load_config
+from utils import profiler
 
 lightautoml_template = 'graph/lightautoml_template.py'
 
@@ -44,7 +51,7 @@ local_exec_error = """В результате выполнения кода во
 ```
 Исправь ошибку"""
 
-timeout = 3000
+skipped_test_result = "Код для тестирования не запускался: он использует результаты кода для обучения, который завершился с ошибкой."
 
 e2b_exec_error = """В результате выполнения кода возникла ошибка:
 ```
@@ -80,40 +87,62 @@ def execute_e2b_code(sandbox, code: str) -> str:
     return result
 
 
-def execute_code_locally(code: str) -> str:
+def run_code_locally(code: str) -> ExecutionResult:
+    with profiler.span('python', 'exec'):
+        execution = _run_code_locally(code)
+        if execution.cached:
+            profiler.record(cached=True)
+        else:
+            profiler.record(queue_time=execution.queue_time, cpu_user=execution.cpu_user,
+                            cpu_system=execution.cpu_system, max_rss=execution.max_rss)
+        return execution
 
-    result = ''
 
+def _run_code_locally(code: str) -> ExecutionResult:
+    config = load_config().general
+
+    cache = get_execution_cache(config) if is_cacheable(code) else None
+    run = None
+    if cache is not None:
+        key = cache.key(code)
+        cached = cache.get(key)
+        if cached is not None:
+            return cached.model_copy(update={'cached': True})
+        run = cache.begin(key)
+
+    execution = None
     with tempfile.NamedTemporaryFile(mode='w', suffix='.py', delete=False) as temp_file:
         temp_file.write(code)
         temp_file.flush()
 
         try:
-            process = subprocess.run(
-                [sys.executable, temp_file.name],
-                capture_output=True,
-                text=True,
-                timeout=timeout
-            )
-
-            if process.returncode == 0:
-                result = local_exec_result.format(process_stdout=process.stdout)
-            else:
-                result = local_exec_error.format(process_stderr=process.stderr)
-
-        except subprocess.TimeoutExpired:
-            result = f"Код превысил время выполнения ({timeout} секунд)"
+            execution = run_python_file(temp_file.name, config)
         finally:
             os.unlink(temp_file.name)
+            if run is not None:
+                cache.finish(run, execution)
+    return execution
 
-    return result
+
+def format_local_result(execution: ExecutionResult) -> str:
+    if execution.timed_out:
+        return f"Код превысил время выполнения ({load_config().general.max_code_execution_time} секунд)"
+    if execution.returncode == 0:
+        return local_exec_result.format(process_stdout=execution.stdout)
+    return local_exec_error.format(process_stderr=execution.stderr)
+
+
+def execute_code_locally(code: str) -> str:
+    return format_local_result(run_code_locally(code))
 
 
 def execute_lightautoml_locally(state: AgentState):
     messages = state['messages']
     json_block = re.findall(JSON_REGEX, messages[-1].content, re.DOTALL | re.MULTILINE)[0]
     config = json.loads(json_block)
+    timeout = load_config().general.max_code_execution_time
     result = ''
+    before = children_usage()
     try:
         process = subprocess.run(
             [
@@ -144,6 +173,7 @@ def execute_lightautoml_locally(state: AgentState):
     except subprocess.TimeoutExpired:
         result = f"Блок {lightautoml_template} превысил время выполнения ({timeout} секунд)"
 
+    profiler.record(**usage_since(before))
     return result
 
 
@@ -155,8 +185,22 @@ def execute_train_test(state: AgentState):
     train_code = code_blocks[0].strip() if len(code_blocks) > 0 else ""
     test_code = code_blocks[1].strip() if len(code_blocks) > 1 else ""
 
-    result_train = execute_code_locally(train_code)
-    result_test = execute_code_locally(test_code)
+    if depends_on(test_code, train_code):
+        # Test code reads what training saves to the shared working directory,
+        # so it has to wait, and is pointless to run if training failed
+        train_execution = run_code_locally(train_code)
+        result_train = format_local_result(train_execution)
+        if train_execution.returncode == 0:
+            result_test = execute_code_locally(test_code)
+        else:
+            result_test = skipped_test_result
+    else:
+        with ThreadPoolExecutor(max_workers=2) as executor:
+            # Copied contexts keep the snippets in the current run profile
+            train_future = executor.submit(contextvars.copy_context().run, execute_code_locally, train_code)
+            test_future = executor.submit(contextvars.copy_context().run, execute_code_locally, test_code)
+            result_train = train_future.result()
+            result_test = test_future.result()
 
     result = AIMessage(content=f"Результаты выполнения кода для обучения:\n{result_train}\n\nРезультаты выполнения кода для тестирования:\n{result_test}")
     return {"messages": result, "train_code": train_code, "test_code": test_code}
@@ -170,7 +214,8 @@ def execute_code(state: AgentState):
     execution_location = state['code_generation_config']
 
     if state['lama']:
-        result = execute_lightautoml_locally(state)
+        with profiler.span('lightautoml_template', 'exec'):
+            result = execute_lightautoml_locally(state)
     # if state['test_split']:
     #     train = code_blocks[0]
     #     test = code_blocks[1]
@@ -186,7 +231,17 @@ def execute_code(state: AgentState):
             result = execute_e2b_code(sandbox, full_code)
 
         if execution_location == 'local':
-            result = execute_code_locally(full_code)
+            prefetched = state.get('prefetched_execution')
+            if prefetched and prefetched['code'] == full_code:
+                # Already run by the code generator while choosing between candidates
+                result = format_local_result(prefetched['execution'])
+            else:
+                result = execute_code_locally(full_code)
+
+        if execution_location == 'kernel':
+            with profiler.span('kernel', 'exec'):
+                result = format_local_result(state['kernel'].run(full_code))
 
-    return {"messages": AIMessage(content=result), 'generated_code': code_to_execute, 'code_results': result, 'lama': False, 'test_split': False}
+    return {"messages": AIMessage(content=result), 'generated_code': code_to_execute, 'code_results': result, 'lama': False, 'test_split': False,
+            'prefetched_execution': None}
 
@@ -0,0 +1,188 @@
+"""Disk cache of local execution results, addressed by code, data and environment.
+
+An entry is keyed by the normalized code (comments and formatting ignored), the
+fingerprints of the datasets/ files, and the interpreter and library versions. It
+stores stdout and stderr of a successful run, the files the run produced in the
+artifact directories and the state those directories were left in. A hit only counts
+while the artifact files still match that state; produced files that were removed
+since are copied back. Only runs that had the process to themselves are stored,
+since the files of concurrent runs cannot be told apart.
+Entries are evicted least recently used first once the cache grows over its size limit.
+"""
+import io
+import os
+import sys
+import json
+import shutil
+import hashlib
+import tokenize
+import threading
+from pathlib import Path
+from importlib import metadata
+from typing import Dict, List, Optional, Set, Tuple
+
+from graph.worker_pool import ExecutionResult
+from utils.fingerprint import directory_fingerprint
+
+NO_CACHE_MARKER = "# lads: no-cache"
+DATASETS_DIR = 'datasets'
+VERSIONED_PACKAGES = ['numpy', 'pandas', 'scikit-learn', 'matplotlib', 'lightautoml']
+
+
+def normalize_code(code: str) -> str:
+    try:
+        tokens = tokenize.generate_tokens(io.StringIO(code).readline)
+        return '\n'.join(f"{token.type}:{token.string}" for token in tokens
+                         if token.type not in (tokenize.COMMENT, tokenize.NL))
+    except (tokenize.TokenError, IndentationError, SyntaxError):
+        return '\n'.join(line.rstrip() for line in code.splitlines() if line.strip())
+
+
+def _environment_fingerprint() -> str:
+    versions = [sys.version]
+    for package in VERSIONED_PACKAGES:
+        try:
+            versions.append(f"{package}=={metadata.version(package)}")
+        except metadata.PackageNotFoundError:
+            versions.append(f"{package}==")
+    return ';'.join(versions)
+
+
+class Run:
+    """A run in progress: the artifact files before it and whether another run overlapped it."""
+
+    def __init__(self, key: str, files: Dict[str, Tuple[int, int]]):
+        self.key = key
+        self.files = files
+        self.overlapped = False
+
+
+class ExecutionCache:
+    def __init__(self, root: Path | str, max_size: int, artifact_dirs: List[str]):
+        self.root = Path(root)
+        self.max_size = max_size
+        self.artifact_dirs = list(artifact_dirs)
+        self._environment = _environment_fingerprint()
+        self._lock = threading.Lock()
+        self._active: Set[Run] = set()
+
+    def key(self, code: str) -> str:
+        digest = hashlib.sha256()
+        # Artifact directories are outputs as much as inputs; they are checked on a hit instead
+        for part in (normalize_code(code), directory_fingerprint(DATASETS_DIR), self._environment):
+            digest.update(part.encode())
+            digest.update(b'\0')
+        return digest.hexdigest()
+
+    def snapshot(self) -> Dict[str, Tuple[int, int]]:
+        files = {}
+        for directory in self.artifact_dirs:
+            for path in Path(directory).rglob('*'):
+                if path.is_file():
+                    stat = path.stat()
+                    files[os.path.relpath(path)] = (stat.st_mtime_ns, stat.st_size)
+        return files
+
+    def get(self, key: str) -> Optional[ExecutionResult]:
+        entry = self.root / key
+        try:
+            result = ExecutionResult(**json.loads((entry / 'result.json').read_text(encoding='utf-8')))
+            left = json.loads((entry / 'files.json').read_text(encoding='utf-8'))
+            created = (entry / 'result.json').stat().st_mtime_ns
+        except (OSError, ValueError):
+            return None
+
+        current = self.snapshot()
+        artifacts = entry / 'artifacts'
+        restore = []
+        for path, stamp in left.items():
+            if current.get(path) == tuple(stamp):
+                continue
+            # A produced file that is gone or older than the entry is put back; any other
+            # change means the run would not see the files it saw, so it has to run again
+            if (artifacts / path).is_file() and (path not in current or current[path][0] <= created):
+                restore.append(path)
+            else:
+                return None
+        for path in restore:
+            Path(path).parent.mkdir(parents=True, exist_ok=True)
+            shutil.copy2(artifacts / path, path)
+        # Entry mtime is the LRU clock
+        os.utime(entry)
+        return result
+
+    def begin(self, key: str) -> Run:
+        run = Run(key, self.snapshot())
+        with self._lock:
+            for other in self._active:
+                other.overlapped = True
+            run.overlapped = bool(self._active)
+            self._active.add(run)
+        return run
+
+    def finish(self, run: Run, result: Optional[ExecutionResult]):
+        """End a run started with `begin`, storing its result if it succeeded on its own."""
+        with self._lock:
+            self._active.discard(run)
+        if result is None or run.overlapped or result.timed_out or result.returncode != 0:
+            return
+        self._put(run.key, result, run.files)
+
+    def _put(self, key: str, result: ExecutionResult, before: Dict[str, Tuple[int, int]]):
+        after = {path: stamp for path, stamp in self.snapshot().items() if not path.startswith('..')}
+        produced = [path for path, stamp in after.items() if before.get(path) != stamp]
+
+        entry = self.root / key
+        staging = self.root / f".{key}.{os.getpid()}.{threading.get_ident()}"
+        shutil.rmtree(staging, ignore_errors=True)
+        (staging / 'artifacts').mkdir(parents=True)
+        for path in produced:
+            target = staging / 'artifacts' / path
+            target.parent.mkdir(parents=True, exist_ok=True)
+            shutil.copy2(path, target)
+        (staging / 'files.json').write_text(json.dumps(after), encoding='utf-8')
+        (staging / 'result.json').write_text(result.model_dump_json(), encoding='utf-8')
+
+        with self._lock:
+            shutil.rmtree(entry, ignore_errors=True)
+            staging.rename(entry)
+            self._evict()
+
+    def _evict(self):
+        entries = []
+        total = 0
+        for entry in self.root.iterdir():
+            if not entry.is_dir() or entry.name.startswith('.'):
+                continue
+            size = sum(path.stat().st_size for path in entry.rglob('*') if path.is_file())
+            entries.append((entry.stat().st_mtime_ns, size, entry))
+            total += size
+
+        for _, size, entry in sorted(entries):
+            if total <= self.max_size:
+                break
+            shutil.rmtree(entry, ignore_errors=True)
+            total -= size
+
+
+_cache: Optional[ExecutionCache] = None
+_cache_lock = threading.Lock()
+
+
+def get_execution_cache(config) -> Optional[ExecutionCache]:
+    """Return the shared cache for the `AgentConfig`, or None when caching is disabled."""
+    global _cache
+
+    if not config.execution_cache:
+        return None
+
+    max_size = config.execution_cache_max_size * 1024 * 1024
+    with _cache_lock:
+        if (_cache is None or _cache.root != Path(config.execution_cache_dir)
+                or _cache.max_size != max_size or _cache.artifact_dirs != list(config.execution_cache_artifact_dirs)):
+            _cache = ExecutionCache(config.execution_cache_dir, max_size, config.execution_cache_artifact_dirs)
+        return _cache
+
+
+def is_cacheable(code: str) -> bool:
+    return NO_CACHE_MARKER not in code
@@ -0,0 +1,96 @@
+"""Static checks that decide whether generated snippets can run side by side."""
+import ast
+import os
+from typing import Dict, Set
+
+WRITE_CALLS = {
+    'dump', 'save', 'save_model', 'savefig', 'to_csv', 'to_parquet', 'to_pickle',
+    'to_feather', 'to_json', 'to_excel', 'write', 'write_text', 'write_bytes',
+}
+READ_CALLS = {
+    'load', 'load_model', 'read_csv', 'read_parquet', 'read_pickle', 'read_feather',
+    'read_json', 'read_excel', 'read_text', 'read_bytes', 'open', 'Path',
+}
+# Calls that restore a fitted object; if their source cannot be resolved the
+# snippet is assumed to depend on whatever the training code produced.
+MODEL_LOAD_CALLS = {'load', 'load_model'}
+
+
+def _call_name(node: ast.Call) -> str:
+    func = node.func
+    if isinstance(func, ast.Attribute):
+        return func.attr
+    if isinstance(func, ast.Name):
+        return func.id
+    return ''
+
+
+def _string_constants(tree: ast.AST) -> Dict[str, str]:
+    names = {}
+    for node in ast.walk(tree):
+        if isinstance(node, ast.Assign) and isinstance(node.value, ast.Constant) and isinstance(node.value.value, str):
+            for target in node.targets:
+                if isinstance(target, ast.Name):
+                    names[target.id] = node.value.value
+    return names
+
+
+def _resolve_paths(node: ast.Call, names: Dict[str, str]) -> Set[str]:
+    paths = set()
+    for arg in [*node.args, *(keyword.value for keyword in node.keywords)]:
+        for sub in ast.walk(arg):
+            if isinstance(sub, ast.Constant) and isinstance(sub.value, str):
+                paths.add(sub.value)
+            elif isinstance(sub, ast.Name) and sub.id in names:
+                paths.add(names[sub.id])
+    return {os.path.normpath(path) for path in paths if path and ('/' in path or '.' in path)}
+
+
+def _is_write_mode(node: ast.Call) -> bool:
+    modes = [keyword.value for keyword in node.keywords if keyword.arg == 'mode']
+    if len(node.args) > 1:
+        modes.append(node.args[1])
+    return any(isinstance(mode, ast.Constant) and isinstance(mode.value, str) and set(mode.value) & set('wax')
+               for mode in modes)
+
+
+def produced_artifacts(code: str) -> Set[str]:
+    """Paths the code writes to, as far as they can be read from the source."""
+    tree = ast.parse(code)
+    names = _string_constants(tree)
+    artifacts = set()
+    for node in ast.walk(tree):
+        if not isinstance(node, ast.Call):
+            continue
+        call = _call_name(node)
+        if call in WRITE_CALLS or (call == 'open' and _is_write_mode(node)):
+            artifacts |= _resolve_paths(node, names)
+    return artifacts
+
+
+def depends_on(code: str, upstream_code: str) -> bool:
+    """Whether `code` may read something `upstream_code` writes.
+
+    Errs on the side of a dependency: unparsable code and model loads whose
+    source cannot be resolved both count as dependent.
+    """
+    try:
+        artifacts = produced_artifacts(upstream_code)
+        tree = ast.parse(code)
+    except SyntaxError:
+        return True
+
+    artifact_names = {os.path.basename(path) for path in artifacts}
+    names = _string_constants(tree)
+    for node in ast.walk(tree):
+        if not isinstance(node, ast.Call):
+            continue
+        call = _call_name(node)
+        if call not in READ_CALLS:
+            continue
+        paths = _resolve_paths(node, names)
+        if paths & artifacts or {os.path.basename(path) for path in paths} & artifact_names:
+            return True
+        if call in MODEL_LOAD_CALLS and not paths:
+            return True
+    return False
@@ -22,8 +22,11 @@ from graph.llm_nodes import (
     fedot_generator,
     final,
 )
-from utils.llm_factory import create_llm
+from graph.prompts import warm_up_prompts
+from graph.worker_pool import get_worker_pool
+from utils.llm_factory import get_llm
 from utils.config.loader import load_config
+from utils.profiler import profiled
 
 INPUT_NODE = "input_node"
 INPUT_AGENT = "rephraser_agent"
@@ -114,6 +117,10 @@ def add_node_name(state: AgentState, node_name: str) -> AgentState:
 def graph_builder() -> StateGraph:
 
     config = load_config()
+    warm_up_prompts()
+    if config.general.code_generation_config == 'local':
+        # Start the warm workers now so they finish importing before the first snippet
+        get_worker_pool(config.general)
 
     workflow = StateGraph(AgentState)
 
@@ -147,10 +154,13 @@ def graph_builder() -> StateGraph:
     }
 
     for node_name, node_func in nodes.items():
-        workflow.add_node(node_name, lambda x, f=node_func, n=node_name: add_node_name(f(x), n))
+        workflow.add_node(node_name, profiled(node_name, 'node', lambda x, f=node_func, n=node_name: add_node_name(f(x), n)))
 
+    # Clients are resolved once per graph, so a node call does not check the config
+    # files; a graph built after config.yml changed gets the new clients
     for node_name, node_func in llm_nodes.items():
-        workflow.add_node(node_name, lambda x, f=node_func, n=node_name: add_node_name(f(x, create_llm(n, config)), n))
+        llm = get_llm(node_name, config)
+        workflow.add_node(node_name, profiled(node_name, 'node', lambda x, f=node_func, n=node_name, llm=llm: add_node_name(f(x, llm), n)))
 
     workflow.add_edge(START, INPUT_NODE)
     workflow.add_edge(INPUT_NODE, CODE_ROUTER)
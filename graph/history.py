@@ -0,0 +1,161 @@
+"""Compaction of the conversation history passed to LLM nodes.
+
+Retry loops append a generated snippet and its traceback on every attempt, and
+code results repeat the same dataset previews, so the raw history grows with each
+iteration. Before a node sends the history it is compacted:
+
+* a code attempt that failed and was later replaced collapses, together with its
+  error, into a one-line note;
+* long paragraphs that appear again later (previews, repeated outputs) are kept
+  only in their last occurrence;
+* the oldest messages are dropped, and oversized ones truncated in the middle,
+  until the history fits the node's token budget.
+"""
+import re
+import logging
+from functools import lru_cache
+from typing import Iterable, List, Tuple
+
+from langchain_core.messages import BaseMessage
+
+from utils.config.loader import load_config
+
+logger = logging.getLogger(__name__)
+
+CODE_REGEX = r"```python(?:-execute)?\n?(.+?)```"
+# A failed run: the headers of the executor's error and timeout results
+# (graph/code_executor_node.py) or a Python traceback. Metric lines such as
+# "Mean Absolute Error: 3.1" must not count.
+FAILURE_REGEX = r"возникла ошибка:|превысил время выполнения|Traceback \(most recent call last\)"
+# The exception line of a traceback, e.g. "KeyError: 'x'" or "pandas.errors.ParserError: ..."
+ERROR_LINE_REGEX = r"^[\w.]*(?:Error|Exception)\b"
+# Paragraphs shorter than this are never deduplicated
+MIN_DEDUP_CHARS = 200
+TRUNCATION_NOTE = "\n[... {tokens} tokens omitted ...]\n"
+
+
+@lru_cache(maxsize=1)
+def _encoding():
+    try:
+        import tiktoken
+        return tiktoken.get_encoding("cl100k_base")
+    except Exception:
+        # No tokenizer available offline, fall back to the ~4 characters per token estimate
+        return None
+
+
+def count_tokens(text: str) -> int:
+    encoding = _encoding()
+    if encoding is None:
+        return len(text) // 4 + 1
+    return len(encoding.encode(text, disallowed_special=()))
+
+
+def _text(message: BaseMessage) -> str:
+    return message.content if isinstance(message.content, str) else str(message.content)
+
+
+def _with_content(message: BaseMessage, content: str) -> BaseMessage:
+    return message.model_copy(update={"content": content})
+
+
+def _error_line(text: str) -> str:
+    lines = [line.strip() for line in text.splitlines() if re.match(ERROR_LINE_REGEX, line.strip())]
+    return lines[-1][:200] if lines else "an error"
+
+
+def collapse_failed_attempts(messages: List[BaseMessage]) -> List[BaseMessage]:
+    """Replace code followed by an error, when newer code exists, with a one-line summary."""
+    has_code = [bool(re.search(CODE_REGEX, _text(message), re.DOTALL)) for message in messages]
+    result = []
+    i = 0
+    while i < len(messages):
+        message = messages[i]
+        superseded = has_code[i] and any(has_code[i + 2:])
+        if superseded and i + 1 < len(messages) and re.search(FAILURE_REGEX, _text(messages[i + 1])):
+            code = re.search(CODE_REGEX, _text(message), re.DOTALL).group(1)
+            summary = (f"[Earlier attempt: {len(code.strip().splitlines())} lines of code, "
+                       f"failed with {_error_line(_text(messages[i + 1]))}; replaced by a later version]")
+            result.append(_with_content(message, summary))
+            i += 2
+            continue
+        result.append(message)
+        i += 1
+    return result
+
+
+def dedupe_paragraphs(messages: List[BaseMessage], reference: Iterable[str] = ()) -> List[BaseMessage]:
+    """Keep long repeated paragraphs only where they last appear (or in the reference texts)."""
+    seen = set()
+    for text in reference:
+        seen.update(p.strip() for p in text.split("\n\n") if len(p.strip()) >= MIN_DEDUP_CHARS)
+
+    result = []
+    for message in reversed(messages):
+        paragraphs = _text(message).split("\n\n")
+        kept = []
+        for paragraph in paragraphs:
+            key = paragraph.strip()
+            if len(key) >= MIN_DEDUP_CHARS:
+                if key in seen:
+                    kept.append("[repeated content omitted]")
+                    continue
+                seen.add(key)
+            kept.append(paragraph)
+        content = "\n\n".join(kept)
+        result.append(message if content == _text(message) else _with_content(message, content))
+    return result[::-1]
+
+
+def _truncate(message: BaseMessage, max_tokens: int) -> BaseMessage:
+    text = _text(message)
+    tokens = count_tokens(text)
+    if tokens <= max_tokens:
+        return message
+    # Keep the head (what was attempted) and the tail (where it failed)
+    keep_chars = max(len(text) * max_tokens // tokens // 2, 1)
+    note = TRUNCATION_NOTE.format(tokens=tokens - max_tokens)
+    return _with_content(message, text[:keep_chars] + note + text[-keep_chars:])
+
+
+def fit_budget(messages: List[BaseMessage], budget: int, keep_last: int) -> List[BaseMessage]:
+    """Drop the oldest messages, then truncate the largest, until the history fits `budget` tokens."""
+    messages = list(messages)
+    sizes = [count_tokens(_text(message)) for message in messages]
+    # The first message is the task, the last ones are what the node is answering
+    while sum(sizes) > budget and len(messages) > keep_last + 1:
+        del messages[1]
+        del sizes[1]
+
+    while sum(sizes) > budget:
+        largest = max(range(len(messages)), key=sizes.__getitem__)
+        target = max(sizes[largest] - (sum(sizes) - budget), budget // (2 * len(messages)), 1)
+        if target >= sizes[largest]:
+            break
+        truncated = _truncate(messages[largest], target)
+        size = count_tokens(_text(truncated))
+        if size >= sizes[largest]:
+            break
+        messages[largest], sizes[largest] = truncated, size
+    return messages
+
+
+def compact_history(messages: List[BaseMessage], node: str,
+                    reference: Iterable[str] = ()) -> Tuple[List[BaseMessage], int]:
+    """History for `node` within its token budget, and the number of tokens saved."""
+    config = load_config().general.history
+    messages = list(messages)
+    if not config.enabled or not messages:
+        return messages, 0
+
+    before = sum(count_tokens(_text(message)) for message in messages)
+    compacted = collapse_failed_attempts(messages)
+    compacted = dedupe_paragraphs(compacted, reference)
+    budget = config.node_budgets.get(node, config.default_budget)
+    compacted = fit_budget(compacted, budget, config.keep_last)
+    after = sum(count_tokens(_text(message)) for message in compacted)
+
+    saved = before - after
+    if saved > 0:
+        logger.info(f"History for {node}: {before} -> {after} tokens ({len(messages)} -> {len(compacted)} messages)")
+    return compacted, saved
@@ -4,12 +4,18 @@ from lightautoml.tasks import Task
 from sklearn.metrics import roc_auc_score
 from sklearn.metrics import r2_score
 
-import pandas as pd
+import os
+import runpy
 from sklearn.model_selection import train_test_split
 import warnings
 
 warnings.filterwarnings("ignore")
 
+# Shared with the FEDOT skeletons and the code generation prompts
+read_dataset = runpy.run_path(os.path.join(
+    os.path.dirname(os.path.abspath(__file__)), '..', 'fedotllm', 'agents', 'automl', 'templates', 'read_dataset.py'
+))['read_dataset']
+
 
 def main():
     parser = argparse.ArgumentParser(description='Run LightAutoML model training')
@@ -24,7 +30,7 @@ def main():
     task_metric = args.task_metric
     target = args.target
 
-    df = pd.read_csv('datasets/'+df_name)
+    df = read_dataset(os.path.join('datasets', df_name))
 
     train_df, test_df = train_test_split(df, test_size=0.2, random_state=42)
 
@@ -4,6 +4,9 @@ import shutil
 
 from graph.state import AgentState
 from graph.prompts import load_prompt
+from graph.history import compact_history
+from graph.candidates import generate_candidates
+from utils.config.loader import load_config
 
 from fedotllm.llm import AIInference
 from fedotllm.main import FedotAI
@@ -16,8 +19,8 @@ PYTHON_REGEX = r"```python-execute(.+?)```"
 
 def construct_user_input(state: AgentState) -> str:
     user_input = f"Задача: {state['task']}\n"
-    if "df" in state:
-        user_input += f"Превью датасета: {state['df'].head().to_string()}\n"
+    if state.get("df") is not None:
+        user_input += f"Превью датасета: {state['df'].head}\n"
         user_input += f"Колонки, которые есть в датасете: {state['df'].columns}\n"
     if "df_name" in state:
         user_input += f"Название файла с датасетом: {state['df_name']}\n"
@@ -91,9 +94,10 @@ def no_code_agent(state: AgentState, llm):
     prompt_template = load_prompt('no_code')
     chain = prompt_template | llm
     user_input = construct_user_input(state)
-    response = chain.invoke({"text": user_input, "history": state['messages']})
+    history, saved = compact_history(state['messages'], 'no_code_agent', reference=[user_input])
+    response = chain.invoke({"text": user_input, "history": history})
     response.content = '\n' + response.content
-    return {"messages": response}
+    return {"messages": response, "history_tokens_saved": saved}
 
 
 def result_explanation_agent(state: AgentState, llm):
@@ -134,8 +138,8 @@ def lightautoml_generator(state: AgentState, llm):
     response = chain.invoke({
         "task": state['task'],
         "file_name": state['df_name'],
-        "df_columns": state['df'].columns.tolist(),
-        "df_head": state['df'].head().to_string()
+        "df_columns": state['df'].columns,
+        "df_head": state['df'].head
     })
     response.content = '\n' + response.content.strip()
     return {"messages": response, 'lama': True}
@@ -155,7 +159,7 @@ def fedot_generator(state: AgentState, llm) -> str:
         inference=AIInference(),
         workspace=output_path,
     )
-    output = fedot_ai.ainvoke(message=state['task'])
+    output = fedot_ai.invoke(message=state['task'])
 
     # Extract the fedotllm agent message for Code interpretation
     fedotllm_message = output['messages'][-1].content if len(output['messages']) > 1 else "No fedotllm message available"
@@ -183,7 +187,8 @@ def human_explanation_agent(state: AgentState, llm):
     chain = prompt_template | llm
 
     last_message = state['messages'][-1].content
-    response = chain.invoke({"text": last_message, "history": state['messages']})
+    history, saved = compact_history(state['messages'], 'human_explanation')
+    response = chain.invoke({"text": last_message, "history": history})
 
     explanation_text = response.content.strip()
     current_understanding = state.get('human_understanding', [])
@@ -191,7 +196,8 @@ def human_explanation_agent(state: AgentState, llm):
 
     return {
         "messages": response,
-        "human_understanding": updated_understanding
+        "human_understanding": updated_understanding,
+        "history_tokens_saved": saved
     }
 
 
@@ -200,9 +206,17 @@ def code_generation_agent(state: AgentState, llm):
     prompt_template = load_prompt('code_generator')
     chain = prompt_template | llm
     user_input = construct_user_input(state)
-    response = chain.invoke({"user_input": user_input, "history": state['messages']})
+    history, saved = compact_history(state['messages'], 'code_generator_agent', reference=[user_input])
+    config = load_config().general
+    if config.code_candidates > 1 and state.get('code_generation_config') == 'local' and not state.get('lama'):
+        candidate = generate_candidates(prompt_template, llm, {"user_input": user_input, "history": history}, config)
+        response = candidate.message
+        response.content = '\n' + response.content
+        prefetched = {"code": candidate.code, "execution": candidate.execution} if candidate.execution else None
+        return {"messages": response, "history_tokens_saved": saved, "prefetched_execution": prefetched}
+    response = chain.invoke({"user_input": user_input, "history": history})
     response.content = '\n' + response.content
-    return {"messages": response}
+    return {"messages": response, "history_tokens_saved": saved}
 
 
 def validate_solution(state: AgentState, llm):
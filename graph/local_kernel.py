@@ -0,0 +1,364 @@
+"""Local notebook-style kernel that re-executes generated code from the first changed cell.
+
+The kernel runs every cell in a process forked from the process holding the state
+after the previous cell. A cell that succeeds leaves its process behind as a
+checkpoint, so when the next version of the code only changes later cells, the
+unchanged prefix is not executed again: the new cells fork from the last matching
+checkpoint and the stored output of the skipped cells is replayed. Past the
+checkpoint limit the oldest checkpoint is merged into the next one, which then
+stands for both cells.
+"""
+import os
+import re
+import ast
+import sys
+import time
+import signal
+import socket
+import atexit
+import hashlib
+import builtins
+import linecache
+import tempfile
+import importlib
+import threading
+import traceback
+import subprocess
+from multiprocessing.connection import Connection
+from multiprocessing.reduction import recv_handle, send_handle
+from typing import Dict, List, Optional
+
+from graph.worker_pool import ExecutionResult
+from utils.fingerprint import directory_fingerprint
+
+CELL_MARKER_REGEX = r"^# ?%%.*$"
+DATASETS_DIR = 'datasets'
+KERNEL_STARTUP_TIMEOUT = 300
+
+
+def split_cells(code: str) -> List[str]:
+    """Split code on `# %%` markers, or into top-level statements if there are none."""
+    if re.search(CELL_MARKER_REGEX, code, re.MULTILINE):
+        cells = re.split(CELL_MARKER_REGEX, code, flags=re.MULTILINE)
+        return [cell.strip('\n') for cell in cells if cell.strip()]
+
+    try:
+        statements = ast.parse(code).body
+    except SyntaxError:
+        return [code]
+    if not statements:
+        return [code]
+
+    lines = code.splitlines(keepends=True)
+    starts = [min([statement.lineno, *(d.lineno for d in getattr(statement, 'decorator_list', []))]) - 1
+              for statement in statements]
+    starts[0] = 0
+    cells = []
+    for i, statement in enumerate(statements):
+        source = ''.join(lines[starts[i]:starts[i + 1] if i + 1 < len(starts) else len(lines)])
+        is_import = isinstance(statement, (ast.Import, ast.ImportFrom))
+        previous_is_import = i > 0 and isinstance(statements[i - 1], (ast.Import, ast.ImportFrom))
+        if cells and is_import and previous_is_import:
+            cells[-1] += source
+        else:
+            cells.append(source)
+    return [cell.strip('\n') for cell in cells]
+
+
+def _cell_key(upstream_key: str, cell: str) -> str:
+    normalized = '\n'.join(line.rstrip() for line in cell.strip().splitlines())
+    return hashlib.sha256(f"{upstream_key}\0{normalized}".encode()).hexdigest()
+
+
+# Kernel side
+
+
+def _execute_cell(source: str, filename: str, namespace: dict, memory_limit: Optional[int]):
+    with tempfile.TemporaryFile() as stdout_file, tempfile.TemporaryFile() as stderr_file:
+        saved_stdout, saved_stderr = os.dup(1), os.dup(2)
+        os.dup2(stdout_file.fileno(), 1)
+        os.dup2(stderr_file.fileno(), 2)
+        ok = True
+        try:
+            if memory_limit:
+                import resource
+                limit = memory_limit * 1024 * 1024
+                resource.setrlimit(resource.RLIMIT_AS, (limit, limit))
+            linecache.cache[filename] = (len(source), None, source.splitlines(keepends=True), filename)
+            exec(compile(source, filename, 'exec'), namespace)
+        except SystemExit as e:
+            ok = e.code in (None, 0)
+        except BaseException as e:
+            ok = False
+            tb = e.__traceback__
+            while tb is not None and not tb.tb_frame.f_code.co_filename.startswith('<cell-'):
+                tb = tb.tb_next
+            sys.stderr.write(''.join(traceback.format_exception(type(e), e, tb or e.__traceback__)))
+        finally:
+            sys.stdout.flush()
+            sys.stderr.flush()
+            os.dup2(saved_stdout, 1)
+            os.dup2(saved_stderr, 2)
+            os.close(saved_stdout)
+            os.close(saved_stderr)
+
+        stdout_file.seek(0)
+        stderr_file.seek(0)
+        return (ok, stdout_file.read().decode('utf-8', errors='replace'),
+                stderr_file.read().decode('utf-8', errors='replace'))
+
+
+def _serve_checkpoint(conn: Connection, namespace: dict):
+    while True:
+        while not conn.poll(1.0):
+            # Reap cells that failed and exited
+            try:
+                while os.waitpid(-1, os.WNOHANG)[0]:
+                    pass
+            except ChildProcessError:
+                pass
+
+        try:
+            message = conn.recv()
+        except EOFError:
+            os._exit(0)
+
+        if message[0] == 'close':
+            os._exit(0)
+
+        _, source, filename, memory_limit = message
+        parent_sock, child_sock = socket.socketpair()
+        pid = os.fork()
+        if pid == 0:
+            conn.close()
+            parent_sock.close()
+            os.setsid()
+            child_conn = Connection(child_sock.detach())
+            ok, stdout, stderr = _execute_cell(source, filename, namespace, memory_limit)
+            child_conn.send((ok, stdout, stderr))
+            if not ok:
+                os._exit(0)
+            conn, namespace = child_conn, namespace
+            continue
+
+        child_sock.close()
+        conn.send(('forked', pid))
+        send_handle(conn, parent_sock.fileno(), None)
+        parent_sock.close()
+
+
+def _serve(fd: int, preload_modules: List[str]):
+    os.dup2(os.open(os.devnull, os.O_RDONLY), 0)
+    os.dup2(os.open(os.devnull, os.O_WRONLY), 1)
+    for module in preload_modules:
+        try:
+            importlib.import_module(module)
+        except Exception as e:
+            print(f"Kernel could not preload {module}: {e}", file=sys.stderr)
+
+    conn = Connection(fd)
+    conn.send(('ready', os.getpid()))
+    _serve_checkpoint(conn, {'__name__': '__main__', '__builtins__': builtins})
+
+
+# Manager side
+
+
+class _Checkpoint:
+    def __init__(self, key: str, conn: Connection, pid: int, stdout: str = "", stderr: str = "", cells: int = 1):
+        self.key = key  # key of the last cell it holds the state after
+        self.cells = cells
+        self.conn = conn
+        self.pid = pid
+        self.stdout = stdout
+        self.stderr = stderr
+
+    def close(self):
+        try:
+            self.conn.send(('close',))
+        except OSError:
+            pass
+        self.conn.close()
+
+
+class KernelError(Exception):
+    pass
+
+
+class LocalKernel:
+    def __init__(self, preload_modules: List[str], timeout: Optional[float] = None,
+                 memory_limit: Optional[int] = None, max_checkpoints: int = 8):
+        self.preload_modules = list(preload_modules)
+        self.timeout = timeout
+        self.memory_limit = memory_limit
+        self.max_checkpoints = max_checkpoints
+        self._lock = threading.Lock()
+        self._process = None
+        self._checkpoints: List[_Checkpoint] = []
+        self._start()
+
+    def _start(self):
+        manager_sock, kernel_sock = socket.socketpair()
+        root_dir = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+        python_path = os.pathsep.join(filter(None, [root_dir, os.environ.get('PYTHONPATH')]))
+        self._process = subprocess.Popen(
+            [sys.executable, '-m', 'graph.local_kernel', str(kernel_sock.fileno()), *self.preload_modules],
+            pass_fds=[kernel_sock.fileno()],
+            env={**os.environ, 'MPLBACKEND': 'Agg', 'PYTHONPATH': python_path},
+        )
+        kernel_sock.close()
+        root = _Checkpoint('', Connection(manager_sock.detach()), self._process.pid, cells=0)
+        self._checkpoints = [root]
+        self._ready = False
+
+    def _wait_ready(self):
+        if self._ready:
+            return
+        root = self._checkpoints[0]
+        if not root.conn.poll(KERNEL_STARTUP_TIMEOUT):
+            raise KernelError("Kernel did not start in time")
+        root.conn.recv()
+        self._ready = True
+
+    def _truncate(self, length: int):
+        for checkpoint in self._checkpoints[length:]:
+            checkpoint.close()
+        del self._checkpoints[length:]
+
+    def _merge_oldest(self):
+        # Every checkpoint is a separate process, so their number is capped
+        while len(self._checkpoints) > max(self.max_checkpoints, 1) + 1:
+            oldest, following = self._checkpoints[1], self._checkpoints[2]
+            following.cells += oldest.cells
+            following.stdout = oldest.stdout + following.stdout
+            following.stderr = oldest.stderr + following.stderr
+            oldest.close()
+            del self._checkpoints[1]
+
+    def _run_cell(self, key: str, source: str, index: int, deadline: Optional[float]):
+        head = self._checkpoints[-1]
+        head.conn.send(('run', source, f'<cell-{index}>', self.memory_limit))
+        _, pid = head.conn.recv()
+        conn = Connection(recv_handle(head.conn))
+
+        remaining = None if deadline is None else max(deadline - time.monotonic(), 0)
+        if not conn.poll(remaining):
+            try:
+                os.killpg(pid, signal.SIGKILL)
+            except ProcessLookupError:
+                pass
+            conn.close()
+            return None
+        try:
+            ok, stdout, stderr = conn.recv()
+        except EOFError:
+            conn.close()
+            return False, "", f"Kernel cell process exited unexpectedly (cell {index})"
+
+        if ok:
+            self._checkpoints.append(_Checkpoint(key, conn, pid, stdout, stderr))
+            self._merge_oldest()
+        else:
+            conn.close()
+        return ok, stdout, stderr
+
+    def run(self, code: str) -> ExecutionResult:
+        """Execute the code, reusing checkpoints of its unchanged leading cells."""
+        with self._lock:
+            try:
+                return self._run(code)
+            except (EOFError, OSError, KernelError):
+                # The kernel lost a process it relied on; start clean and run everything
+                self.restart()
+                return self._run(code)
+
+    def _run(self, code: str) -> ExecutionResult:
+        if self._process.poll() is not None:
+            raise KernelError("Kernel process has exited")
+        self._wait_ready()
+
+        cells = split_cells(code)
+        keys = []
+        upstream = directory_fingerprint(DATASETS_DIR)
+        for cell in cells:
+            upstream = _cell_key(upstream, cell)
+            keys.append(upstream)
+
+        # Cell keys chain the keys before them, so a checkpoint matches by its last cell
+        reused = 0
+        matched = 0
+        for checkpoint in self._checkpoints[1:]:
+            end = reused + checkpoint.cells
+            if end > len(cells) or checkpoint.key != keys[end - 1]:
+                break
+            reused = end
+            matched += 1
+        self._truncate(matched + 1)
+
+        stdout = [checkpoint.stdout for checkpoint in self._checkpoints[1:]]
+        stderr = [checkpoint.stderr for checkpoint in self._checkpoints[1:]]
+        deadline = time.monotonic() + self.timeout if self.timeout else None
+
+        for index in range(reused, len(cells)):
+            outcome = self._run_cell(keys[index], cells[index], index + 1, deadline)
+            if outcome is None:
+                return ExecutionResult(returncode=-signal.SIGKILL, stdout=''.join(stdout),
+                                       stderr=''.join(stderr), timed_out=True)
+            ok, cell_stdout, cell_stderr = outcome
+            stdout.append(cell_stdout)
+            stderr.append(cell_stderr)
+            if not ok:
+                return ExecutionResult(returncode=1, stdout=''.join(stdout), stderr=''.join(stderr))
+
+        return ExecutionResult(returncode=0, stdout=''.join(stdout), stderr=''.join(stderr))
+
+    def restart(self):
+        self.close()
+        self._start()
+
+    def close(self):
+        self._truncate(0)
+        if self._process is not None and self._process.poll() is None:
+            self._process.kill()
+            self._process.wait()
+
+
+_kernels: Dict[str, LocalKernel] = {}
+_kernels_lock = threading.Lock()
+
+
+def get_kernel(session_id: str, config) -> LocalKernel:
+    """Return the kernel for `session_id`, starting it with the `AgentConfig` limits if needed."""
+    with _kernels_lock:
+        kernel = _kernels.get(session_id)
+        if kernel is None:
+            kernel = LocalKernel(
+                config.worker_preload_modules,
+                timeout=config.max_code_execution_time,
+                memory_limit=config.max_code_execution_memory,
+                max_checkpoints=config.kernel_max_checkpoints,
+            )
+            _kernels[session_id] = kernel
+        return kernel
+
+
+def shutdown_kernel(session_id: str):
+    with _kernels_lock:
+        kernel = _kernels.pop(session_id, None)
+    if kernel is not None:
+        kernel.close()
+
+
+def _shutdown_kernels():
+    with _kernels_lock:
+        kernels = list(_kernels.values())
+        _kernels.clear()
+    for kernel in kernels:
+        kernel.close()
+
+
+atexit.register(_shutdown_kernels)
+
+
+if __name__ == '__main__':
+    _serve(int(sys.argv[1]), sys.argv[2:])
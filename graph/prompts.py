@@ -1,15 +1,30 @@
+import threading
+from typing import Dict, Tuple
+
 from utils.config.loader import load_config
 from graph.prompts_ru import GIGACHAT_PROMPTS_RU
 from graph.prompts_en import GIGACHAT_PROMPTS_EN
 from langchain_core.prompts import ChatPromptTemplate, MessagesPlaceholder
 
 
-def load_prompt(prompt_name: str, model: str = 'gigachat') -> ChatPromptTemplate:
-    messages = []
-    config = load_config()
-    prompts = GIGACHAT_PROMPTS_RU if config.general.prompt_language == "ru" else GIGACHAT_PROMPTS_EN
+DEFAULT_MODEL_FAMILY = 'gigachat'
+
+PROMPT_SETS: Dict[Tuple[str, str], Dict[str, Dict[str, str]]] = {
+    ('ru', 'gigachat'): GIGACHAT_PROMPTS_RU,
+    ('en', 'gigachat'): GIGACHAT_PROMPTS_EN,
+}
+
+_registry: Dict[Tuple[str, str, str], ChatPromptTemplate] = {}
+_registry_lock = threading.Lock()
 
-    prompt_data = prompts[prompt_name]
+
+def _prompt_set(language: str, model: str) -> Dict[str, Dict[str, str]]:
+    return PROMPT_SETS.get((language, model), PROMPT_SETS[(language, DEFAULT_MODEL_FAMILY)])
+
+
+def build_prompt(prompt_name: str, language: str, model: str = DEFAULT_MODEL_FAMILY) -> ChatPromptTemplate:
+    messages = []
+    prompt_data = _prompt_set(language, model)[prompt_name]
 
     if 'system' in prompt_data:
         messages.append(("system", prompt_data['system']))
@@ -20,3 +35,28 @@ def load_prompt(prompt_name: str, model: str = 'gigachat') -> ChatPromptTemplate
         messages.append(("user", prompt_data['user']))
 
     return ChatPromptTemplate(messages)
+
+
+def warm_up_prompts() -> int:
+    """Compile every prompt of every language and model family into the registry."""
+    with _registry_lock:
+        for (language, model), prompts in PROMPT_SETS.items():
+            for prompt_name in prompts:
+                key = (prompt_name, language, model)
+                if key not in _registry:
+                    _registry[key] = build_prompt(prompt_name, language, model)
+        return len(_registry)
+
+
+def load_prompt(prompt_name: str, model: str = DEFAULT_MODEL_FAMILY) -> ChatPromptTemplate:
+    language = load_config().general.prompt_language
+    key = (prompt_name, language, model)
+
+    prompt = _registry.get(key)
+    if prompt is None:
+        with _registry_lock:
+            prompt = _registry.get(key)
+            if prompt is None:
+                prompt = build_prompt(prompt_name, language, model)
+                _registry[key] = prompt
+    return prompt
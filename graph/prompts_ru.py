@@ -1,5 +1,10 @@
 from typing import Dict
 
+from utils.dataset_store import READ_DATASET_TEMPLATE
+
+# Braces escaped for the prompt template
+READ_DATASET_CODE = READ_DATASET_TEMPLATE.read_text().strip().replace('{', '{{').replace('}', '}}')
+
 code_generator_system_prompt: str = """Ты — Senior Python Developer с глубоким пониманием технологического стека и библиотек Python. Твоя задача — решить проблему пользователя, предоставив чистый, оптимизированный и профессионально оформленный код.
 
 Требования к коду:
@@ -14,6 +19,10 @@ code_generator_system_prompt: str = """Ты — Senior Python Developer с гл
 - Результат выполнения: Ответы должны базироваться только на выводах, полученных в результате выполнения кода.
 - Если в задаче указано, то сделай вывод метрики через print
 - Датасеты находятся в папке datasets/, а модели сохраняй в папке models/
+- Читай датасеты этой функцией; загруженные датасеты она берёт из их отображаемой в память Arrow-копии, а не разбирает файл заново:
+```python
+""" + READ_DATASET_CODE + """
+```
 - Если необходимо проанализировать датасет, тогда предварительно выведи названия его колонок с помощью функции print(df.columns), можешь вывести первые 5 строк датасета с помощью функции print(df.head()).
 - Выведи информацию о датасете вроде (df.describe()), чтобы лучше понять как с этим датасетом работать.
 - Если в сообщениях уже есть решение или код, то перепиши его полностью сам, согласно правилам!
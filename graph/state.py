@@ -1,19 +1,20 @@
-import pandas as pd
-from typing import Annotated, Sequence, List, Optional
+import operator
+from typing import Annotated, Any, Dict, Sequence, List, Optional
 from typing_extensions import TypedDict
 from langchain_core.messages import AnyMessage
 from langgraph.graph.message import add_messages
 from e2b_code_interpreter import Sandbox
+from graph.local_kernel import LocalKernel
+from utils.dataset_store import DatasetHandle
 
 
 class AgentState(TypedDict):
     messages: Annotated[Sequence[AnyMessage], add_messages]
     task: str
-    df: Optional[pd.DataFrame]
-    df_train: Optional[pd.DataFrame]
-    df_test: Optional[pd.DataFrame]
+    df: Optional[DatasetHandle]
     df_name: str
     sandbox: Sandbox
+    kernel: LocalKernel
     code_improvement_count: int
     current_node: str
     feedback: List[str]
@@ -27,5 +28,7 @@ class AgentState(TypedDict):
     code_generation_config: str
     train_code: str
     test_code: str
-    test_df: Optional[pd.DataFrame]
+    test_df: Optional[DatasetHandle]
     test_df_name: str
+    history_tokens_saved: Annotated[int, operator.add]
+    prefetched_execution: Optional[Dict[str, Any]]
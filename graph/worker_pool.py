@@ -0,0 +1,425 @@
+"""Warm interpreters for running generated code locally.
+
+Each worker is a "zygote": a long-lived interpreter that imports the heavy libraries
+once and then forks a fresh child for every snippet. The child gets its own process
+group, output files and resource limits, so snippets stay isolated from each other
+while the import cost is paid only when the worker starts.
+"""
+import os
+import sys
+import json
+import time
+import logging
+import queue
+import select
+import signal
+import atexit
+import runpy
+import tempfile
+import importlib
+import threading
+import traceback
+import subprocess
+from typing import List, Optional, Set
+
+from pydantic import BaseModel
+
+logger = logging.getLogger(__name__)
+
+# Time to wait for a worker to finish importing its preload modules
+WORKER_STARTUP_TIMEOUT = 300
+# Extra time given to a worker to report on a child it has already killed
+WORKER_RESPONSE_GRACE = 30
+# ru_maxrss is in kilobytes on Linux and in bytes on macOS
+RSS_UNIT = 1 if sys.platform == 'darwin' else 1024
+
+
+class ExecutionResult(BaseModel):
+    returncode: int
+    stdout: str = ""
+    stderr: str = ""
+    timed_out: bool = False
+    cpu_user: Optional[float] = None
+    cpu_system: Optional[float] = None
+    max_rss: Optional[int] = None  # bytes
+    queue_time: float = 0.0  # waiting for a free worker
+    cached: bool = False  # served by the execution cache
+
+
+class WorkerPoolError(Exception):
+    pass
+
+
+class WorkerTimeoutError(WorkerPoolError):
+    pass
+
+
+class WorkerLostError(WorkerPoolError):
+    """The worker failed after it was given the request, so the code may have run."""
+
+    def __init__(self, message: str, timed_out: bool = False):
+        super().__init__(message)
+        self.timed_out = timed_out
+
+
+def _kill_group(pgid: int):
+    try:
+        os.killpg(pgid, signal.SIGKILL)
+    except ProcessLookupError:
+        pass
+
+
+class Cancellation:
+    """Handle that stops the runs it is passed to, by killing their process groups.
+
+    Runs that have not started yet when it is cancelled are not started at all.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._groups: Set[int] = set()
+        self.cancelled = False
+
+    def cancel(self):
+        with self._lock:
+            self.cancelled = True
+            groups = list(self._groups)
+        for pgid in groups:
+            _kill_group(pgid)
+
+    def register(self, pgid: int) -> bool:
+        """Track a running process group; False if it has to be stopped right away."""
+        with self._lock:
+            if not self.cancelled:
+                self._groups.add(pgid)
+            return not self.cancelled
+
+    def unregister(self, pgid: int):
+        with self._lock:
+            self._groups.discard(pgid)
+
+
+CANCELLED_RESULT = ExecutionResult(returncode=-signal.SIGKILL, stderr="The run was cancelled")
+
+
+# Worker side
+
+
+def _format_user_traceback(exc: BaseException, code_path: str) -> str:
+    tb = exc.__traceback__
+    # Drop the runpy frames so the traceback looks like `python code_path`
+    while tb is not None and tb.tb_frame.f_code.co_filename != code_path:
+        tb = tb.tb_next
+    return "".join(traceback.format_exception(type(exc), exc, tb or exc.__traceback__))
+
+
+def _run_child(code_path: str, cwd: str, memory_limit: Optional[int], stdout_fd: int, stderr_fd: int):
+    exit_code = 1
+    try:
+        os.setsid()
+        os.chdir(cwd)
+        devnull = os.open(os.devnull, os.O_RDONLY)
+        os.dup2(devnull, 0)
+        os.dup2(stdout_fd, 1)
+        os.dup2(stderr_fd, 2)
+        if memory_limit:
+            import resource
+            limit = memory_limit * 1024 * 1024
+            resource.setrlimit(resource.RLIMIT_AS, (limit, limit))
+
+        sys.argv = [code_path]
+        sys.path[0] = os.path.dirname(code_path)
+        try:
+            runpy.run_path(code_path, run_name='__main__')
+            exit_code = 0
+        except SystemExit as e:
+            if e.code is None:
+                exit_code = 0
+            elif isinstance(e.code, int):
+                exit_code = e.code
+            else:
+                print(e.code, file=sys.stderr)
+                exit_code = 1
+        except BaseException as e:
+            sys.stderr.write(_format_user_traceback(e, code_path))
+            exit_code = 1
+    finally:
+        try:
+            sys.stdout.flush()
+            sys.stderr.flush()
+        finally:
+            os._exit(exit_code)
+
+
+def _wait_child(pid: int, timeout: Optional[float]):
+    deadline = time.monotonic() + timeout if timeout else None
+    delay = 0.005
+    while True:
+        wpid, status, usage = os.wait4(pid, os.WNOHANG)
+        if wpid:
+            return os.waitstatus_to_exitcode(status), False, usage
+        if deadline is not None and time.monotonic() > deadline:
+            try:
+                os.killpg(pid, signal.SIGKILL)
+            except ProcessLookupError:
+                pass
+            _, status, usage = os.wait4(pid, 0)
+            return os.waitstatus_to_exitcode(status), True, usage
+        time.sleep(delay)
+        delay = min(delay * 2, 0.05)
+
+
+def _run_forked(request: dict, protocol) -> dict:
+    with tempfile.TemporaryFile() as stdout_file, tempfile.TemporaryFile() as stderr_file:
+        pid = os.fork()
+        if pid == 0:
+            # Otherwise the pool would not see the channel close if the worker died
+            os.close(protocol.fileno())
+            _run_child(request['code_path'], request['cwd'], request.get('memory_limit'),
+                       stdout_file.fileno(), stderr_file.fileno())
+        # Lets the pool kill the snippet if it loses the worker
+        protocol.write(json.dumps({'pid': pid}) + '\n')
+
+        returncode, timed_out, usage = _wait_child(pid, request.get('timeout'))
+
+        stdout_file.seek(0)
+        stderr_file.seek(0)
+        return {
+            'returncode': returncode,
+            'stdout': stdout_file.read().decode('utf-8', errors='replace'),
+            'stderr': stderr_file.read().decode('utf-8', errors='replace'),
+            'timed_out': timed_out,
+            'cpu_user': usage.ru_utime,
+            'cpu_system': usage.ru_stime,
+            'max_rss': usage.ru_maxrss * RSS_UNIT,
+        }
+
+
+def _serve(preload_modules: List[str]):
+    # fd 1 is the protocol channel; anything the libraries print goes to /dev/null
+    protocol = os.fdopen(os.dup(1), 'w', buffering=1)
+    os.dup2(os.open(os.devnull, os.O_WRONLY), 1)
+
+    for module in preload_modules:
+        try:
+            importlib.import_module(module)
+        except Exception as e:
+            print(f"Worker could not preload {module}: {e}", file=sys.stderr)
+
+    protocol.write(json.dumps({'ready': True}) + '\n')
+    for line in sys.stdin:
+        if not line.strip():
+            continue
+        protocol.write(json.dumps(_run_forked(json.loads(line), protocol)) + '\n')
+
+
+# Pool side
+
+
+class _Worker:
+    def __init__(self, preload_modules: List[str]):
+        self.process = subprocess.Popen(
+            [sys.executable, os.path.abspath(__file__), *preload_modules],
+            stdin=subprocess.PIPE,
+            stdout=subprocess.PIPE,
+            bufsize=0,
+            env={**os.environ, 'MPLBACKEND': 'Agg'},
+        )
+        # Read with os.read, since a buffered readline could take in lines select() no longer sees
+        self._buffer = b''
+        self.ready = False
+        self.child: Optional[int] = None  # process group of the snippet being run
+
+    def alive(self) -> bool:
+        return self.process.poll() is None
+
+    def _read_message(self, timeout: Optional[float]) -> dict:
+        deadline = time.monotonic() + timeout if timeout is not None else None
+        fd = self.process.stdout.fileno()
+        while b'\n' not in self._buffer:
+            remaining = None if deadline is None else max(deadline - time.monotonic(), 0)
+            readable, _, _ = select.select([fd], [], [], remaining)
+            if not readable:
+                raise WorkerTimeoutError("Worker did not respond in time")
+            chunk = os.read(fd, 65536)
+            if not chunk:
+                raise WorkerPoolError(f"Worker exited with code {self.process.poll()}")
+            self._buffer += chunk
+        line, self._buffer = self._buffer.split(b'\n', 1)
+        return json.loads(line)
+
+    def run(self, code_path: str, cwd: str, timeout: Optional[float], memory_limit: Optional[int],
+            cancel: Optional[Cancellation] = None) -> ExecutionResult:
+        if not self.ready:
+            self._read_message(WORKER_STARTUP_TIMEOUT)
+            self.ready = True
+
+        request = {'code_path': code_path, 'cwd': cwd, 'timeout': timeout, 'memory_limit': memory_limit}
+        try:
+            self.process.stdin.write((json.dumps(request) + '\n').encode())
+        except (BrokenPipeError, OSError) as e:
+            raise WorkerPoolError(f"Worker is not accepting requests: {e}") from e
+
+        response_timeout = timeout + WORKER_RESPONSE_GRACE if timeout else None
+        try:
+            self.child = self._read_message(WORKER_RESPONSE_GRACE)['pid']
+            if cancel is not None and not cancel.register(self.child):
+                _kill_group(self.child)
+            return ExecutionResult(**self._read_message(response_timeout))
+        except WorkerPoolError as e:
+            raise WorkerLostError(str(e), timed_out=isinstance(e, WorkerTimeoutError)) from e
+        finally:
+            if cancel is not None and self.child is not None:
+                cancel.unregister(self.child)
+
+    def close(self):
+        if self.child is not None:
+            # The snippet has its own session and would outlive the worker
+            _kill_group(self.child)
+        if self.alive():
+            self.process.kill()
+        self.process.wait()
+
+
+class WorkerPool:
+    def __init__(self, size: int, preload_modules: List[str]):
+        self.size = size
+        self.preload_modules = list(preload_modules)
+        self._idle = queue.Queue()
+        for _ in range(size):
+            self._idle.put(_Worker(self.preload_modules))
+
+    def run(self, code_path: str, cwd: Optional[str] = None, timeout: Optional[float] = None,
+            memory_limit: Optional[int] = None, cancel: Optional[Cancellation] = None) -> ExecutionResult:
+        """Run a Python file in a child forked from an idle warm worker."""
+        queued = time.perf_counter()
+        worker = self._idle.get()
+        queue_time = time.perf_counter() - queued
+        try:
+            if cancel is not None and cancel.cancelled:
+                return CANCELLED_RESULT.model_copy(update={'queue_time': queue_time})
+            if not worker.alive():
+                worker = _Worker(self.preload_modules)
+            result = worker.run(os.path.abspath(code_path), cwd or os.getcwd(), timeout, memory_limit, cancel)
+            return result.model_copy(update={'queue_time': queue_time})
+        except WorkerLostError as e:
+            # Running the code again could repeat its side effects, so the run is reported as failed
+            worker.close()
+            worker = _Worker(self.preload_modules)
+            return ExecutionResult(returncode=-signal.SIGKILL, stderr=f"The worker running the code was lost: {e}",
+                                   timed_out=e.timed_out, queue_time=queue_time)
+        except WorkerPoolError:
+            # The worker state is unknown now, so start over with a fresh one
+            worker.close()
+            worker = _Worker(self.preload_modules)
+            raise
+        finally:
+            worker.child = None
+            self._idle.put(worker)
+
+    def close(self):
+        for _ in range(self.size):
+            self._idle.get().close()
+
+
+_pool: Optional[WorkerPool] = None
+_pool_lock = threading.Lock()
+
+
+def get_worker_pool(config) -> Optional[WorkerPool]:
+    """Return the shared pool for the `AgentConfig`, or None when warm workers are disabled."""
+    global _pool
+
+    if config.worker_pool_size <= 0 or not hasattr(os, 'fork'):
+        return None
+
+    stale = None
+    with _pool_lock:
+        if (_pool is None or _pool.size != config.worker_pool_size
+                or _pool.preload_modules != list(config.worker_preload_modules)):
+            stale = _pool
+            _pool = WorkerPool(config.worker_pool_size, config.worker_preload_modules)
+        pool = _pool
+    if stale is not None:
+        # Waits for the snippets still running on it, so other callers are not held up
+        stale.close()
+    return pool
+
+
+def _close_pool():
+    if _pool is not None:
+        _pool.close()
+
+
+atexit.register(_close_pool)
+
+
+def children_usage():
+    """CPU time and peak RSS of all waited-for children of this process so far."""
+    import resource
+    usage = resource.getrusage(resource.RUSAGE_CHILDREN)
+    return usage.ru_utime, usage.ru_stime, usage.ru_maxrss * RSS_UNIT
+
+
+def usage_since(before) -> dict:
+    """Children usage accumulated since `before`; the peak RSS is the largest child ever seen."""
+    user, system, max_rss = children_usage()
+    return {'cpu_user': user - before[0], 'cpu_system': system - before[1], 'max_rss': max_rss}
+
+
+def _limit_memory(memory_limit: int):
+    import resource
+    limit = memory_limit * 1024 * 1024
+    resource.setrlimit(resource.RLIMIT_AS, (limit, limit))
+
+
+def run_python_file(code_path: str, config, cwd: Optional[str] = None,
+                    cancel: Optional[Cancellation] = None) -> ExecutionResult:
+    """Run a Python file with the timeout and memory limit from `AgentConfig`.
+
+    Uses the warm worker pool when it is enabled and falls back to a cold
+    `sys.executable` subprocess otherwise, or when no worker could take the request.
+    """
+    timeout = config.max_code_execution_time
+    memory_limit = config.max_code_execution_memory
+
+    pool = get_worker_pool(config)
+    if pool is not None:
+        try:
+            return pool.run(code_path, cwd=cwd, timeout=timeout, memory_limit=memory_limit, cancel=cancel)
+        except WorkerPoolError as e:
+            # Raised only before a worker was given the request
+            logger.warning(f"Worker pool unavailable, running {code_path} in a new interpreter: {e}")
+
+    preexec_fn = None
+    if memory_limit and os.name == 'posix':
+        preexec_fn = lambda: _limit_memory(memory_limit)  # noqa: E731
+    if cancel is not None and cancel.cancelled:
+        return CANCELLED_RESULT
+    before = children_usage()
+    # A session of its own, so a timeout or a cancellation stops what the code started as well
+    process = subprocess.Popen(
+        [sys.executable, code_path],
+        stdout=subprocess.PIPE,
+        stderr=subprocess.PIPE,
+        text=True,
+        preexec_fn=preexec_fn,
+        cwd=cwd,
+        start_new_session=True,
+    )
+    if cancel is not None and not cancel.register(process.pid):
+        _kill_group(process.pid)
+    try:
+        stdout, stderr = process.communicate(timeout=timeout)
+        return ExecutionResult(returncode=process.returncode, stdout=stdout, stderr=stderr, **usage_since(before))
+    except subprocess.TimeoutExpired:
+        _kill_group(process.pid)
+        stdout, stderr = process.communicate()
+        return ExecutionResult(returncode=-signal.SIGKILL, stdout=stdout, stderr=stderr, timed_out=True,
+                               **usage_since(before))
+    finally:
+        if cancel is not None:
+            cancel.unregister(process.pid)
+
+if __name__ == '__main__':
+    _serve(sys.argv[1:])
@@ -0,0 +1,23 @@
+from langchain_core.messages import AIMessage, HumanMessage
+
+from graph.history import collapse_failed_attempts
+
+CODE = "```python-execute\nprint('x')\n```"
+
+
+def test_successful_attempt_with_metric_output_is_kept():
+    result = AIMessage(content="Результат выполнения кода:\n```\nMean Absolute Error: 3.1\nRoot Mean Squared Error: 4.2\n```")
+    messages = [HumanMessage(content="task"), AIMessage(content=CODE), result, AIMessage(content=CODE)]
+
+    assert collapse_failed_attempts(messages) == messages
+
+
+def test_failed_attempt_is_collapsed():
+    error = AIMessage(content="В результате выполнения кода возникла ошибка:\n```\nTraceback (most recent call last):\n"
+                              "  File \"x.py\", line 1, in <module>\nKeyError: 'target'\n```\nИсправь ошибку")
+    messages = [HumanMessage(content="task"), AIMessage(content=CODE), error, AIMessage(content=CODE)]
+
+    collapsed = collapse_failed_attempts(messages)
+
+    assert len(collapsed) == 3
+    assert "failed with KeyError: 'target'" in collapsed[1].content
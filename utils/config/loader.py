@@ -1,13 +1,46 @@
+import threading
 import yaml
 from pathlib import Path
+from typing import Optional, Tuple
 from .schema import AppConfig, SecretsConfig
 
 
-def load_config() -> AppConfig:
-    config_path = Path("config.yml")
-    with config_path.open("r", encoding="utf-8") as f:
+CONFIG_PATH = Path("config.yml")
+ENV_PATH = Path(".env")
+
+_lock = threading.Lock()
+_snapshot: Optional[AppConfig] = None
+_snapshot_stamp: Optional[Tuple] = None
+
+
+def _read_config() -> AppConfig:
+    with CONFIG_PATH.open("r", encoding="utf-8") as f:
         data = yaml.safe_load(f)
 
     secrets = SecretsConfig()
     config = AppConfig(**data, secrets=secrets)
     return config.inject_all_secrets()
+
+
+def _sources_stamp() -> Tuple:
+    stamp = []
+    for path in (CONFIG_PATH, ENV_PATH):
+        try:
+            stat = path.stat()
+            stamp.append((stat.st_mtime_ns, stat.st_size))
+        except FileNotFoundError:
+            stamp.append(None)
+    return tuple(stamp)
+
+
+def load_config() -> AppConfig:
+    """Return the shared config snapshot, re-reading it only when config.yml or .env changed."""
+    global _snapshot, _snapshot_stamp
+
+    stamp = _sources_stamp()
+    with _lock:
+        if _snapshot is None or stamp != _snapshot_stamp:
+            _snapshot = _read_config()
+            _snapshot_stamp = stamp
+        return _snapshot
+
@@ -1,9 +1,13 @@
-from typing import Any, Dict, Optional, Literal
-from pydantic import BaseModel as PydanticBaseModel, SecretStr, Field
+from typing import Any, Dict, List, Optional, Literal
+from pydantic import BaseModel as PydanticBaseModel, ConfigDict, SecretStr, Field
 from pydantic_settings import BaseSettings, SettingsConfigDict
 
 
 class SecretInjectableModel(PydanticBaseModel):
+    # Loaded configs are shared process-wide. Frozen only stops reassigning fields;
+    # nested lists and dicts are still mutable and must be treated as read-only
+    model_config = ConfigDict(frozen=True)
+
     def inject_secrets(self, secrets: Any, context: Optional[Dict[str, Any]] = None):
         context = context or {}
         data = self.model_dump()
@@ -65,13 +69,41 @@ class LangfuseConfig(SecretInjectableModel):
     secret_key: Optional[SecretStr] = Field(None, json_schema_extra={"metadata": {"secret_source": "LANGFUSE_SECRET_KEY"}})
 
 
+class HistoryConfig(SecretInjectableModel):
+    enabled: bool = True
+    default_budget: int = 6000  # tokens
+    node_budgets: Dict[str, int] = Field(
+        default_factory=lambda: {"code_generator_agent": 8000, "no_code_agent": 4000, "human_explanation": 3000}
+    )
+    keep_last: int = 4  # most recent messages that are never dropped
+
+
 class AgentConfig(SecretInjectableModel):
     max_improvements: int = 5
     recursion_limit: int = 1000
     max_code_execution_time: int = 3000
-    code_generation_config: Optional[str] = 'local'
+    max_code_execution_memory: Optional[int] = None  # MB, no limit by default
+    worker_pool_size: int = 2  # 0 runs every snippet in a cold subprocess
+    worker_preload_modules: List[str] = Field(
+        default_factory=lambda: ["numpy", "pandas", "sklearn", "matplotlib.pyplot", "lightautoml"]
+    )
+    code_generation_config: Optional[str] = 'local'  # 'local', 'kernel' or 'e2b'
+    kernel_max_checkpoints: int = 8  # cell processes a 'kernel' conversation keeps alive
+    execution_cache: bool = False  # mark a snippet with '# lads: no-cache' to always run it
+    execution_cache_dir: str = ".cache/executions"
+    execution_cache_max_size: int = 1024  # MB
+    execution_cache_artifact_dirs: List[str] = Field(default_factory=lambda: ["models"])
     e2b_token: Optional[SecretStr] = Field(None, json_schema_extra={"metadata": {"secret_source": "E2B_API_KEY"}})
     prompt_language: Literal["ru", "en"] = "ru"
+    history: HistoryConfig = Field(default_factory=HistoryConfig)
+    profile_dir: Optional[str] = ".cache/profiles"  # run profiles (JSON and folded stacks), empty to only log them
+    code_candidates: int = 1  # solutions generated and run in parallel per attempt ('local' execution only)
+    candidate_selection: Literal["first_success", "best"] = "first_success"
+    candidate_temperatures: List[float] = Field(default_factory=lambda: [0.2, 0.7, 1.0])
+    candidate_metric: Optional[str] = None  # metric printed by the code that ranks candidates for 'best'
+    candidate_greater_is_better: bool = True
+    candidate_dir: str = ".cache/candidates"
+    candidate_shared_paths: List[str] = Field(default_factory=lambda: ["datasets"])  # linked into candidate dirs
 
 
 class FedotTemplates(SecretInjectableModel):
@@ -81,13 +113,48 @@ class FedotTemplates(SecretInjectableModel):
     predict: str
 
 
+class LLMCacheConfig(SecretInjectableModel):
+    enabled: bool = True
+    path: Optional[str] = ".cache/llm_responses.sqlite"  # empty keeps the cache in memory only
+    ttl: Optional[int] = 86400  # seconds
+    memory_entries: int = 256
+    max_size: int = 256  # MB on disk
+    near_duplicates: bool = False  # ignore whitespace, temp/workspace paths and timestamps
+
+
+class ReplayConfig(SecretInjectableModel):
+    mode: Literal["off", "record", "replay"] = "off"  # replay answers every LLM call from the cassette
+    path: str = ".cache/cassettes/session.jsonl"
+    latency: float = 0.0  # seconds added to each replayed call
+
+
+class ExecutionLimitsConfig(SecretInjectableModel):
+    wall_timeout: Optional[float] = None  # seconds
+    cpu_timeout: Optional[float] = None  # CPU seconds of the whole process group
+    memory_limit: Optional[int] = None  # MB of address space per process (RLIMIT_AS)
+    rss_limit: Optional[int] = None  # MB resident in the whole process group
+    cgroup_root: Optional[str] = None  # delegated cgroup v2 directory; each run gets a child with memory.max
+    kill_grace: float = 5.0  # seconds between SIGTERM and SIGKILL
+    abort_on_fatal_output: bool = True  # stop at a fatal pattern instead of waiting for the exit
+    fatal_patterns: List[str] = Field(  # output lines no code can recover from; handled errors must not match
+        default_factory=lambda: [
+            r"^Fatal Python error:",
+            r"CUDA error: (?:an illegal memory access was encountered|device-side assert triggered)",
+        ]
+    )
+
+
 class FedotConfig(SecretInjectableModel):
     provider: str = "openai"
     model_name: str = "gpt-4o"
     base_url: Optional[str] = None
     fix_tries: int = 2
+    max_concurrent_requests: int = 4  # per provider, across the whole process
     templates: FedotTemplates
     predictor_init_kwargs: Dict[str, Any] = Field(default_factory=dict)
+    cache: LLMCacheConfig = Field(default_factory=LLMCacheConfig)
+    dataset_cache_dir: Optional[str] = ".cache/datasets"  # None disables the dataset profile cache
+    execution: ExecutionLimitsConfig = Field(default_factory=ExecutionLimitsConfig)
 
 
 class SecretsConfig(BaseSettings):
@@ -106,16 +173,19 @@ class AppConfig(SecretInjectableModel):
     fedot: FedotConfig
     langfuse: Optional[LangfuseConfig] = None
     general: AgentConfig
+    replay: ReplayConfig = Field(default_factory=ReplayConfig)
 
     secrets: SecretsConfig
 
     model_overrides: Optional[Dict[str, LLMConfig]] = None
 
     def inject_all_secrets(self):
-        self.llm = self.llm.inject_secrets(self.secrets, context=self.llm.model_dump())
+        update = {"llm": self.llm.inject_secrets(self.secrets, context=self.llm.model_dump())}
         if self.langfuse:
-            self.langfuse = self.langfuse.inject_secrets(self.secrets)
+            update["langfuse"] = self.langfuse.inject_secrets(self.secrets)
         if self.model_overrides:
-            for key, val in self.model_overrides.items():
-                self.model_overrides[key] = val.inject_secrets(self.secrets, context=val.model_dump())
-        return self
+            update["model_overrides"] = {
+                key: val.inject_secrets(self.secrets, context=val.model_dump())
+                for key, val in self.model_overrides.items()
+            }
+        return self.model_copy(update=update)
@@ -0,0 +1,145 @@
+"""Arrow copies of uploaded datasets, shared by every consumer through memory mapping.
+
+Each upload is decoded once and written as an uncompressed Feather (Arrow IPC) file
+under datasets/.arrow/. Readers map the file instead of parsing the original upload
+again: the Arrow buffers are shared through the page cache, and numeric columns
+without nulls become pandas blocks that point straight into the mapping. The copy
+records the size and mtime of the file it was made from, and is only used while
+they still match. Generated code reads it through the read_dataset template.
+
+Graph state carries a `DatasetHandle` (path, fingerprint, schema and a rendered head)
+instead of the frame itself; nodes that need the data map the stored copy again.
+"""
+import os
+from pathlib import Path
+from typing import Dict, List, Optional, Sequence
+
+import pandas as pd
+import pyarrow as pa
+import pyarrow.feather as feather
+from pydantic import BaseModel, ConfigDict
+
+from utils.fingerprint import file_fingerprint
+
+DATASETS_DIR = Path('datasets')
+STORE_DIR = DATASETS_DIR / '.arrow'
+# Schema metadata key holding the "size:mtime_ns" of the source file
+SOURCE_KEY = b'source'
+READ_DATASET_TEMPLATE = Path(__file__).parents[1] / 'fedotllm' / 'agents' / 'automl' / 'templates' / 'read_dataset.py'
+
+
+def store_path(name: str, datasets_dir: Path | str = DATASETS_DIR) -> Path:
+    return Path(datasets_dir) / '.arrow' / f"{name}.arrow"
+
+
+def _source_stamp(name: str, datasets_dir: Path | str) -> Optional[bytes]:
+    try:
+        stat = (Path(datasets_dir) / name).stat()
+    except OSError:
+        return None
+    return f"{stat.st_size}:{stat.st_mtime_ns}".encode()
+
+
+def has_dataset(name: str, datasets_dir: Path | str = DATASETS_DIR) -> bool:
+    """Whether the store holds a copy of `name` made from its source file as it is now."""
+    stamp = _source_stamp(name, datasets_dir)
+    if stamp is None:
+        return False
+    try:
+        metadata = open_table(name, datasets_dir).schema.metadata or {}
+    except (pa.ArrowException, OSError):
+        return False
+    return metadata.get(SOURCE_KEY) == stamp
+
+
+def _write_table(table: pa.Table, name: str, datasets_dir: Path | str) -> Path:
+    path = store_path(name, datasets_dir)
+    metadata = dict(table.schema.metadata or {})
+    metadata.pop(SOURCE_KEY, None)
+    stamp = _source_stamp(name, datasets_dir)
+    if stamp is not None:
+        metadata[SOURCE_KEY] = stamp
+    path.parent.mkdir(parents=True, exist_ok=True)
+    staging = path.with_name(f".{path.name}.{os.getpid()}")
+    feather.write_feather(table.replace_schema_metadata(metadata), staging, compression='uncompressed')
+    os.replace(staging, path)
+    return path
+
+
+def materialize(df: pd.DataFrame, name: str, datasets_dir: Path | str = DATASETS_DIR) -> Path:
+    """Write the Arrow copy of a decoded upload, stamped with its source file if that is on disk."""
+    # An index that carries data (e.g. the first column of a CSV upload) is stored as a
+    # column and comes back as a plain index; a default one is not stored and comes back
+    # as a RangeIndex, which readers drop
+    default_index = isinstance(df.index, pd.RangeIndex) and df.index.start == 0 and df.index.step == 1 \
+        and df.index.name is None
+    return _write_table(pa.Table.from_pandas(df, preserve_index=not default_index), name, datasets_dir)
+
+
+def open_table(name: str, datasets_dir: Path | str = DATASETS_DIR) -> pa.Table:
+    return feather.read_table(store_path(name, datasets_dir), memory_map=True)
+
+
+def read_frame(name: str, datasets_dir: Path | str = DATASETS_DIR,
+               columns: Optional[Sequence[str]] = None) -> pd.DataFrame:
+    table = open_table(name, datasets_dir)
+    if columns is not None:
+        table = table.select(list(columns))
+    return table.to_pandas(split_blocks=True)
+
+
+def take_rows(name: str, target: str, indices: Sequence[int], datasets_dir: Path | str = DATASETS_DIR) -> Path:
+    """Store the given rows of a stored dataset under a new name, without going through pandas."""
+    return _write_table(open_table(name, datasets_dir).take(pa.array(indices, type=pa.int64())), target, datasets_dir)
+
+
+def remove(name: str, datasets_dir: Path | str = DATASETS_DIR):
+    store_path(name, datasets_dir).unlink(missing_ok=True)
+
+
+class DatasetHandle(BaseModel):
+    model_config = ConfigDict(frozen=True)
+
+    name: str
+    path: Optional[str]
+    fingerprint: str
+    columns: List[str]
+    dtypes: Dict[str, str]
+    num_rows: int
+    head: str
+
+    def load(self) -> pd.DataFrame:
+        if self.path is None:
+            raise FileNotFoundError(f"Dataset {self.name} has no stored copy")
+        return feather.read_table(self.path, memory_map=True).to_pandas(split_blocks=True)
+
+
+def register_dataset(name: str, df: Optional[pd.DataFrame] = None,
+                     datasets_dir: Path | str = DATASETS_DIR) -> DatasetHandle:
+    """Handle of a stored dataset, storing `df` first if the store has no current copy of it."""
+    path = store_path(name, datasets_dir)
+    try:
+        if df is not None and not has_dataset(name, datasets_dir):
+            materialize(df, name, datasets_dir)
+        elif not path.exists():
+            raise FileNotFoundError(f"Dataset {name} is not in the store")
+        fingerprint = file_fingerprint(path)
+        if df is None:
+            df = read_frame(name, datasets_dir)
+    except (pa.ArrowException, OSError):
+        if df is None:
+            raise
+        # Not storable; the handle only describes the frame
+        path = None
+        fingerprint = f"memory:{name}:{id(df)}"
+
+    return DatasetHandle(
+        name=name,
+        path=str(path) if path is not None else None,
+        fingerprint=fingerprint,
+        columns=[str(column) for column in df.columns],
+        dtypes={str(column): str(dtype) for column, dtype in df.dtypes.items()},
+        num_rows=len(df),
+        head=df.head().to_string(),
+    )
+
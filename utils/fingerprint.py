@@ -0,0 +1,35 @@
+import hashlib
+from pathlib import Path
+from typing import Iterable, Optional
+
+# Bytes hashed from the head and the tail of a file; the rest is covered by size and mtime
+FAST_HASH_BLOCK = 1 << 20
+
+
+def file_fingerprint(path: Path | str) -> str:
+    """Cheap content fingerprint: size, mtime and the first and last blocks of the file."""
+    path = Path(path)
+    stat = path.stat()
+    digest = hashlib.sha256(f"{stat.st_size}:{stat.st_mtime_ns}".encode())
+    with path.open("rb") as f:
+        digest.update(f.read(FAST_HASH_BLOCK))
+        if stat.st_size > 2 * FAST_HASH_BLOCK:
+            f.seek(-FAST_HASH_BLOCK, 2)
+            digest.update(f.read(FAST_HASH_BLOCK))
+    return digest.hexdigest()
+
+
+def directory_fingerprint(path: Path | str, suffixes: Optional[Iterable[str]] = None) -> str:
+    """Fingerprint of every file under `path` (optionally only the given suffixes)."""
+    path = Path(path)
+    digest = hashlib.sha256()
+    if not path.exists():
+        return digest.hexdigest()
+
+    suffixes = set(suffixes) if suffixes is not None else None
+    for file in sorted(p for p in path.rglob("*") if p.is_file()):
+        if suffixes is not None and file.suffix not in suffixes:
+            continue
+        digest.update(str(file.relative_to(path)).encode())
+        digest.update(file_fingerprint(file).encode())
+    return digest.hexdigest()
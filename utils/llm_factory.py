@@ -1,10 +1,34 @@
+import threading
+
 from langchain_gigachat.chat_models import GigaChat
 from langchain_openai import ChatOpenAI
 
+from utils.llm_replay import RecordingChatModel, ReplayChatModel, get_cassette
+
+
+_LLM_REGISTRY = {}
+_LLM_REGISTRY_LOCK = threading.Lock()
+
+
+def resolve_llm_config(node_name, config):
+    if config.model_overrides and node_name in config.model_overrides:
+        return config.model_overrides[node_name]
+    return config.llm
+
 
 def create_llm(node_name, config):
+    cassette = get_cassette(config.replay)
+    if cassette is not None and cassette.replaying:
+        return ReplayChatModel(cassette=cassette, model_name=resolve_llm_config(node_name, config).model_name)
+    llm = _create_client(node_name, config)
+    if cassette is not None:
+        return RecordingChatModel(model=llm, cassette=cassette)
+    return llm
+
 
-    llm_cfg = config.model_overrides.get(node_name) if config.model_overrides and node_name in config.model_overrides else config.llm
+def _create_client(node_name, config):
+
+    llm_cfg = resolve_llm_config(node_name, config)
 
     if llm_cfg.provider == "gigachat":
         return GigaChat(
@@ -13,7 +37,7 @@ def create_llm(node_name, config):
             scope=llm_cfg.scope,
             verify_ssl_certs=llm_cfg.verify_ssl,
             profanity_check=llm_cfg.profanity_check,
-            timeout=llm_cfg.timeout 
+            timeout=llm_cfg.timeout
         )
     if llm_cfg.provider == "openai":
         return ChatOpenAI(
@@ -23,3 +47,34 @@ def create_llm(node_name, config):
         )
     else:
         raise ValueError(f"Unknown LLM provider: {llm_cfg.provider}")
+
+
+def _registry_key(llm_cfg):
+    token = llm_cfg.token.get_secret_value() if llm_cfg.token else None
+    return (
+        llm_cfg.provider,
+        llm_cfg.model_name,
+        llm_cfg.base_url,
+        llm_cfg.scope,
+        llm_cfg.verify_ssl,
+        llm_cfg.profanity_check,
+        llm_cfg.timeout,
+        token,
+    )
+
+
+def get_llm(node_name, config):
+    """Return a shared client for the node, building it only for a new LLM config.
+
+    Nodes that resolve to the same `LLMConfig` share one client (and its HTTP pool
+    and GigaChat access token) across graph runs and sessions.
+    """
+    cassette = get_cassette(config.replay)
+    key = (_registry_key(resolve_llm_config(node_name, config)), id(cassette))
+    with _LLM_REGISTRY_LOCK:
+        llm = _LLM_REGISTRY.get(key)
+        if llm is None:
+            llm = create_llm(node_name, config)
+            _LLM_REGISTRY[key] = llm
+    return llm
+
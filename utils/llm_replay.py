@@ -0,0 +1,200 @@
+"""Record LLM traffic of a session to a cassette file and replay it without a network.
+
+In `record` mode every chat model built by `create_llm` and every `AIInference`
+call is passed through to the provider and the request and response are appended
+to a JSON lines cassette. In `replay` mode no client is built at all: chat models
+are replaced by `ReplayChatModel` and `AIInference` answers from the cassette, so a
+recorded session runs deterministically and offline, and its timing measures only
+our own code.
+
+Requests are matched by a normalized hash of their messages (workspace paths and
+timestamps are masked, see `fedotllm.cache.normalize_text`); a request that was
+made several times is answered with its recorded responses in order.
+"""
+import json
+import time
+import threading
+from collections import defaultdict
+from pathlib import Path
+from typing import Any, Dict, Iterator, List, Optional, Tuple
+
+from langchain_core.language_models.chat_models import BaseChatModel
+from langchain_core.messages import AIMessage, AIMessageChunk, BaseMessage
+from langchain_core.outputs import ChatGeneration, ChatGenerationChunk, ChatResult
+
+from fedotllm.cache import cache_key
+
+MODES = ('off', 'record', 'replay')
+
+
+class ReplayMissError(LookupError):
+    pass
+
+
+def request_key(kind: str, messages: List[Dict[str, Any]]) -> str:
+    return cache_key(kind, messages, {}, near_duplicates=True)
+
+
+def chat_messages(messages: List[BaseMessage]) -> List[Dict[str, Any]]:
+    return [{'role': message.type, 'content': message.content} for message in messages]
+
+
+class Cassette:
+    def __init__(self, path: Path | str, mode: str, latency: float = 0.0):
+        if mode not in MODES[1:]:
+            raise ValueError(f"Unknown cassette mode: {mode}")
+        self.path = Path(path)
+        self.mode = mode
+        self.latency = latency
+        self._lock = threading.Lock()
+        self._responses: Dict[str, List[dict]] = defaultdict(list)
+        self._played: Dict[str, int] = defaultdict(int)
+
+        if mode == 'replay':
+            with self.path.open(encoding='utf-8') as f:
+                for line in f:
+                    if line.strip():
+                        entry = json.loads(line)
+                        self._responses[entry['key']].append(entry)
+        else:
+            self.path.parent.mkdir(parents=True, exist_ok=True)
+            self.path.write_text('', encoding='utf-8')
+
+    @property
+    def recording(self) -> bool:
+        return self.mode == 'record'
+
+    @property
+    def replaying(self) -> bool:
+        return self.mode == 'replay'
+
+    def record(self, kind: str, model: str, messages: List[Dict[str, Any]], content: str,
+               usage: Optional[Dict[str, int]] = None, node: Optional[str] = None, elapsed: float = 0.0):
+        entry = {
+            'key': request_key(kind, messages),
+            'kind': kind,
+            'node': node,
+            'model': model,
+            'messages': messages,
+            'content': content,
+            'usage': usage or {},
+            'elapsed': elapsed,
+        }
+        with self._lock, self.path.open('a', encoding='utf-8') as f:
+            f.write(json.dumps(entry, ensure_ascii=False, default=str) + '\n')
+
+    def replay(self, kind: str, messages: List[Dict[str, Any]], node: Optional[str] = None) -> dict:
+        key = request_key(kind, messages)
+        with self._lock:
+            entries = self._responses.get(key)
+            if not entries:
+                raise ReplayMissError(f"No recorded {kind} response for this request (node {node}) in {self.path}")
+            # Repeats of a request get the recorded answers in order, then the last one again
+            entry = entries[min(self._played[key], len(entries) - 1)]
+            self._played[key] += 1
+        if self.latency:
+            time.sleep(self.latency)
+        return entry
+
+    def rewind(self):
+        """Replay from the first recorded answer of every request again."""
+        with self._lock:
+            self._played.clear()
+
+
+_cassette: Optional[Cassette] = None
+_cassette_source: Optional[Tuple] = None
+_override: Optional[Tuple] = None
+_cassette_lock = threading.Lock()
+
+
+def use_cassette(path: Optional[Path | str], mode: str = 'replay', latency: float = 0.0):
+    """Override the `replay` section of config.yml for this process (None restores it)."""
+    global _override
+    with _cassette_lock:
+        _override = (str(path), mode, latency) if path is not None else None
+
+
+def get_cassette(config) -> Optional[Cassette]:
+    """Return the session cassette for the `ReplayConfig`, or None when recording is off."""
+    global _cassette, _cassette_source
+
+    with _cassette_lock:
+        source = _override or (config.path, config.mode, config.latency)
+        if source[1] == 'off':
+            return None
+        if _cassette is None or _cassette_source != source:
+            _cassette = Cassette(source[0], source[1], source[2])
+            _cassette_source = source
+        return _cassette
+
+
+def _node(run_manager) -> Optional[str]:
+    return (getattr(run_manager, 'metadata', None) or {}).get('langgraph_node')
+
+
+def _usage(message: BaseMessage) -> Dict[str, int]:
+    return dict(getattr(message, 'usage_metadata', None) or {})
+
+
+class RecordingChatModel(BaseChatModel):
+    """Passes calls to the wrapped model and writes them to the cassette."""
+
+    model: BaseChatModel
+    cassette: Any
+
+    @property
+    def _llm_type(self) -> str:
+        return f"recording-{self.model._llm_type}"
+
+    def _generate(self, messages, stop=None, run_manager=None, **kwargs) -> ChatResult:
+        started = time.perf_counter()
+        result = self.model._generate(messages, stop=stop, **kwargs)
+        message = result.generations[0].message
+        self.cassette.record('chat', self.model._llm_type, chat_messages(messages), message.content,
+                             _usage(message), _node(run_manager), time.perf_counter() - started)
+        return result
+
+    def _stream(self, messages, stop=None, run_manager=None, **kwargs) -> Iterator[ChatGenerationChunk]:
+        started = time.perf_counter()
+        content = []
+        usage = {}
+        for chunk in self.model._stream(messages, stop=stop, **kwargs):
+            content.append(chunk.message.content if isinstance(chunk.message.content, str) else '')
+            usage = _usage(chunk.message) or usage
+            if run_manager:
+                run_manager.on_llm_new_token(chunk.text, chunk=chunk)
+            yield chunk
+        self.cassette.record('chat', self.model._llm_type, chat_messages(messages), ''.join(content),
+                             usage, _node(run_manager), time.perf_counter() - started)
+
+
+class ReplayChatModel(BaseChatModel):
+    """Answers from the cassette; streams the recorded answer word by word."""
+
+    cassette: Any
+    model_name: str = 'replay'
+
+    @property
+    def _llm_type(self) -> str:
+        return 'replay'
+
+    def _message(self, messages, run_manager) -> Tuple[str, Dict[str, int]]:
+        entry = self.cassette.replay('chat', chat_messages(messages), _node(run_manager))
+        return entry['content'], entry.get('usage') or {}
+
+    def _generate(self, messages, stop=None, run_manager=None, **kwargs) -> ChatResult:
+        content, usage = self._message(messages, run_manager)
+        message = AIMessage(content=content, usage_metadata=usage or None)
+        return ChatResult(generations=[ChatGeneration(message=message)])
+
+    def _stream(self, messages, stop=None, run_manager=None, **kwargs) -> Iterator[ChatGenerationChunk]:
+        content, usage = self._message(messages, run_manager)
+        words = content.split(' ')
+        for i, word in enumerate(words):
+            text = word if i == len(words) - 1 else word + ' '
+            chunk = ChatGenerationChunk(message=AIMessageChunk(
+                content=text, usage_metadata=usage or None if i == len(words) - 1 else None))
+            if run_manager:
+                run_manager.on_llm_new_token(text, chunk=chunk)
+            yield chunk
@@ -0,0 +1,285 @@
+"""Built-in time and token accounting for one agent run.
+
+A run profile is a tree of spans: graph nodes, LLM calls made through LangChain or
+`AIInference`, and executed code. Each span records wall time, time spent queued
+(waiting for a provider slot or a free worker), prompt and completion tokens,
+retries, and the CPU time and peak RSS of the subprocess that ran generated code.
+
+The active run and span live in context variables, so LangGraph worker threads and
+asyncio tasks started inside the run report into it without passing it around. At
+the end of a run the profile is written as JSON, as folded stacks (the input format
+of flamegraph tools) and summarized as a text flame graph.
+"""
+import json
+import time
+import uuid
+import logging
+import threading
+import functools
+from pathlib import Path
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Any, Dict, List, Optional
+
+from pydantic import BaseModel
+from langchain_core.callbacks import BaseCallbackHandler
+
+logger = logging.getLogger(__name__)
+
+SUMMARY_WIDTH = 30
+# Metrics summed when recorded several times on one span; the rest keep the maximum
+ADDITIVE_METRICS = {'queue_time', 'prompt_tokens', 'completion_tokens', 'retries', 'cpu_user', 'cpu_system'}
+
+
+class Span(BaseModel):
+    id: int
+    parent: Optional[int] = None
+    name: str
+    kind: str
+    start: float
+    wall: float = 0.0
+    queue_time: float = 0.0
+    prompt_tokens: int = 0
+    completion_tokens: int = 0
+    retries: int = 0
+    cpu_user: float = 0.0
+    cpu_system: float = 0.0
+    max_rss: int = 0  # bytes
+    cached: bool = False
+    error: Optional[str] = None
+
+
+class RunProfile:
+    def __init__(self, run_id: Optional[str] = None):
+        self.run_id = run_id or uuid.uuid4().hex[:12]
+        self.started_at = time.time()
+        self._origin = time.perf_counter()
+        self.spans: List[Span] = []
+        self._lock = threading.Lock()
+
+    def open(self, name: str, kind: str, parent: Optional[Span]) -> Span:
+        with self._lock:
+            span = Span(id=len(self.spans), parent=parent.id if parent else None, name=name, kind=kind,
+                        start=time.perf_counter() - self._origin)
+            self.spans.append(span)
+        return span
+
+    def close(self, span: Span, error: Optional[BaseException] = None):
+        span.wall = time.perf_counter() - self._origin - span.start
+        if error is not None:
+            span.error = f"{type(error).__name__}: {error}"
+
+    def _path(self, span: Span) -> List[str]:
+        path = []
+        while span is not None:
+            path.append(f"{span.kind}:{span.name}" if span.kind == 'llm' else span.name)
+            span = self.spans[span.parent] if span.parent is not None else None
+        return path[::-1]
+
+    def totals(self) -> Dict[str, Any]:
+        roots = [span for span in self.spans if span.parent is None]
+        return {
+            'wall': time.perf_counter() - self._origin,
+            'nodes_wall': sum(span.wall for span in roots),
+            'prompt_tokens': sum(span.prompt_tokens for span in self.spans),
+            'completion_tokens': sum(span.completion_tokens for span in self.spans),
+            'retries': sum(span.retries for span in self.spans),
+            'llm_calls': sum(1 for span in self.spans if span.kind == 'llm'),
+            'cached_llm_calls': sum(1 for span in self.spans if span.kind == 'llm' and span.cached),
+            'max_rss': max((span.max_rss for span in self.spans), default=0),
+        }
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            'run_id': self.run_id,
+            'started_at': self.started_at,
+            'totals': self.totals(),
+            'spans': [span.model_dump() for span in self.spans],
+        }
+
+    def folded(self) -> str:
+        """Folded stacks, self time in milliseconds per line."""
+        children_wall: Dict[int, float] = {}
+        for span in self.spans:
+            if span.parent is not None:
+                children_wall[span.parent] = children_wall.get(span.parent, 0.0) + span.wall
+        stacks: Dict[str, float] = {}
+        for span in self.spans:
+            own = max(span.wall - children_wall.get(span.id, 0.0), 0.0)
+            key = ';'.join(self._path(span))
+            stacks[key] = stacks.get(key, 0.0) + own
+        return '\n'.join(f"{stack} {round(ms * 1000)}" for stack, ms in stacks.items() if ms > 0)
+
+    def flame_summary(self) -> str:
+        """Indented tree of span paths with their total time, calls and tokens."""
+        aggregated: Dict[tuple, Dict[str, float]] = {}
+        for span in self.spans:
+            entry = aggregated.setdefault(tuple(self._path(span)), dict.fromkeys(
+                ['wall', 'calls', 'prompt_tokens', 'completion_tokens', 'retries', 'cpu', 'max_rss'], 0))
+            entry['wall'] += span.wall
+            entry['calls'] += 1
+            entry['prompt_tokens'] += span.prompt_tokens
+            entry['completion_tokens'] += span.completion_tokens
+            entry['retries'] += span.retries
+            entry['cpu'] += span.cpu_user + span.cpu_system
+            entry['max_rss'] = max(entry['max_rss'], span.max_rss)
+
+        totals = self.totals()
+        total = max(totals['nodes_wall'], 1e-9)
+        lines = [f"Run {self.run_id}: {totals['wall']:.2f}s wall, {totals['llm_calls']} LLM calls "
+                 f"({totals['cached_llm_calls']} cached), {totals['prompt_tokens']} prompt + "
+                 f"{totals['completion_tokens']} completion tokens, {totals['retries']} retries"]
+        for path in sorted(aggregated, key=lambda p: [self._first_start(p[:i + 1]) for i in range(len(p))]):
+            entry = aggregated[path]
+            bar = '#' * max(1, round(SUMMARY_WIDTH * entry['wall'] / total))
+            details = [f"{entry['wall']:.2f}s", f"x{entry['calls']}"]
+            if entry['prompt_tokens'] or entry['completion_tokens']:
+                details.append(f"{entry['prompt_tokens']}+{entry['completion_tokens']} tok")
+            if entry['retries']:
+                details.append(f"{entry['retries']} retries")
+            if entry['cpu']:
+                details.append(f"cpu {entry['cpu']:.2f}s")
+            if entry['max_rss']:
+                details.append(f"rss {entry['max_rss'] / 2 ** 20:.0f}MB")
+            lines.append(f"{'  ' * (len(path) - 1)}{path[-1]:<{40 - 2 * len(path)}} {bar:<{SUMMARY_WIDTH}} "
+                         + ', '.join(details))
+        return '\n'.join(lines)
+
+    def _first_start(self, path: tuple) -> float:
+        return min((span.start for span in self.spans if tuple(self._path(span)) == path), default=0.0)
+
+    def export(self, directory: Path | str) -> Path:
+        directory = Path(directory)
+        directory.mkdir(parents=True, exist_ok=True)
+        path = directory / f"{time.strftime('%Y%m%d_%H%M%S', time.localtime(self.started_at))}_{self.run_id}.json"
+        path.write_text(json.dumps(self.to_dict(), indent=2), encoding='utf-8')
+        path.with_suffix('.folded').write_text(self.folded(), encoding='utf-8')
+        return path
+
+
+_current_run: ContextVar[Optional[RunProfile]] = ContextVar('lads_profile_run', default=None)
+_current_span: ContextVar[Optional[Span]] = ContextVar('lads_profile_span', default=None)
+
+
+def current_run() -> Optional[RunProfile]:
+    return _current_run.get()
+
+
+@contextmanager
+def profile_run(run_id: Optional[str] = None, export_dir: Optional[str] = None):
+    """Collect spans of everything started in this context; export and log the summary at the end."""
+    profile = RunProfile(run_id)
+    run_token = _current_run.set(profile)
+    span_token = _current_span.set(None)
+    try:
+        yield profile
+    finally:
+        _current_span.reset(span_token)
+        _current_run.reset(run_token)
+        logger.info("Run profile\n%s", profile.flame_summary())
+        if export_dir:
+            try:
+                logger.info(f"Run profile written to {profile.export(export_dir)}")
+            except OSError as e:
+                logger.warning(f"Could not write run profile: {e}")
+
+
+def open_span(name: str, kind: str, parent: Optional[Span] = None) -> Optional[Span]:
+    profile = _current_run.get()
+    if profile is None:
+        return None
+    return profile.open(name, kind, parent if parent is not None else _current_span.get())
+
+
+def close_span(span: Optional[Span], error: Optional[BaseException] = None):
+    profile = _current_run.get()
+    if span is not None and profile is not None:
+        profile.close(span, error)
+
+
+@contextmanager
+def span(name: str, kind: str):
+    current = open_span(name, kind)
+    if current is None:
+        yield None
+        return
+    token = _current_span.set(current)
+    try:
+        yield current
+    except BaseException as e:
+        close_span(current, e)
+        raise
+    else:
+        close_span(current)
+    finally:
+        _current_span.reset(token)
+
+
+def record(target: Optional[Span] = None, **metrics):
+    """Add metrics to `target` or the current span; a no-op outside a profiled run."""
+    target = target if target is not None else _current_span.get()
+    if target is None:
+        return
+    for name, value in metrics.items():
+        if value is None:
+            continue
+        if name in ADDITIVE_METRICS:
+            setattr(target, name, getattr(target, name) + value)
+        elif name == 'max_rss':
+            target.max_rss = max(target.max_rss, int(value))
+        else:
+            setattr(target, name, value)
+
+
+def record_retry(retry_state=None):
+    """tenacity `before_sleep` hook."""
+    record(retries=1)
+
+
+def profiled(name: str, kind: str, func):
+    """Wrap a graph node so that each call is a span."""
+    @functools.wraps(func)
+    def wrapper(*args, **kwargs):
+        with span(name, kind):
+            return func(*args, **kwargs)
+    return wrapper
+
+
+class ProfilerCallbackHandler(BaseCallbackHandler):
+    """Turns LangChain chat model calls into LLM spans of the current run."""
+
+    def __init__(self):
+        self._spans: Dict[Any, Span] = {}
+
+    def on_chat_model_start(self, serialized, messages, *, run_id, **kwargs):
+        params = kwargs.get('invocation_params') or {}
+        name = params.get('model') or params.get('model_name') or (serialized or {}).get('name', 'chat_model')
+        opened = open_span(str(name), 'llm')
+        if opened is not None:
+            self._spans[run_id] = opened
+
+    def on_llm_end(self, response, *, run_id, **kwargs):
+        opened = self._spans.pop(run_id, None)
+        if opened is None:
+            return
+        prompt_tokens = completion_tokens = 0
+        usage = (response.llm_output or {}).get('token_usage') or {}
+        if usage:
+            prompt_tokens = usage.get('prompt_tokens', 0)
+            completion_tokens = usage.get('completion_tokens', 0)
+        else:
+            for generations in response.generations:
+                for generation in generations:
+                    metadata = getattr(getattr(generation, 'message', None), 'usage_metadata', None) or {}
+                    prompt_tokens += metadata.get('input_tokens', 0)
+                    completion_tokens += metadata.get('output_tokens', 0)
+        record(opened, prompt_tokens=prompt_tokens, completion_tokens=completion_tokens)
+        close_span(opened)
+
+    def on_llm_error(self, error, *, run_id, **kwargs):
+        close_span(self._spans.pop(run_id, None), error)
+
+    def on_retry(self, retry_state, *, run_id, **kwargs):
+        opened = self._spans.get(run_id)
+        if opened is not None:
+            record(opened, retries=1)